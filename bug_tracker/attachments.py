@@ -0,0 +1,203 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+
+from memory_db import InMemoryDatabase
+from stats import STATE_PROJECTION
+
+# Where attachment contents are kept: "gridfs" (in MongoDB) or "local" (files under ATTACHMENT_DIR).
+# The in-memory database always uses "local".
+ATTACHMENT_STORE = os.getenv("ATTACHMENT_STORE", "gridfs")
+ATTACHMENT_DIR = os.getenv("ATTACHMENT_DIR", os.path.join(tempfile.gettempdir(), "bug_tracker_attachments"))
+
+# Largest attachment accepted
+ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", 50 * 1024 * 1024))
+
+# Size of the pieces attachments are stored and streamed in (GridFS' default chunk size)
+ATTACHMENT_CHUNK_SIZE = int(os.getenv("ATTACHMENT_CHUNK_SIZE", 255 * 1024))
+
+
+class _Digest:
+    """Size and SHA-256 of a stream, enforcing ATTACHMENT_MAX_BYTES as it is read."""
+
+    def __init__(self):
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+
+    def update(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > ATTACHMENT_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Attachments are limited to {ATTACHMENT_MAX_BYTES} bytes")
+        self.sha256.update(chunk)
+
+
+class GridFSBlobStore:
+    """Attachment contents in a GridFS bucket of the bug tracker database."""
+
+    def __init__(self, db):
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name="attachments", chunk_size_bytes=ATTACHMENT_CHUNK_SIZE)
+
+    async def save(self, chunks: AsyncIterator[bytes], filename: str) -> Tuple[str, _Digest]:
+        digest = _Digest()
+        upload = self.bucket.open_upload_stream(filename)
+        try:
+            async for chunk in chunks:
+                digest.update(chunk)
+                await upload.write(chunk)
+        except BaseException:
+            await upload.abort()
+            raise
+        await upload.close()
+        return str(upload._id), digest
+
+    async def open(self, blob_id: str) -> AsyncIterator[bytes]:
+        try:
+            download = await self.bucket.open_download_stream(ObjectId(blob_id))
+        except (NoFile, InvalidId):
+            raise HTTPException(status_code=404, detail="Attachment content not found")
+
+        async def chunks():
+            while chunk := await download.readchunk():
+                yield chunk
+        return chunks()
+
+    async def delete(self, blob_id: str) -> None:
+        try:
+            await self.bucket.delete(ObjectId(blob_id))
+        except (NoFile, InvalidId):
+            pass
+
+
+class LocalBlobStore:
+    """Attachment contents as files in a local directory, written and read in worker threads."""
+
+    def __init__(self, directory: str = ATTACHMENT_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, blob_id: str) -> str:
+        if not blob_id.isalnum():
+            raise HTTPException(status_code=404, detail="Attachment content not found")
+        return os.path.join(self.directory, blob_id)
+
+    async def save(self, chunks: AsyncIterator[bytes], filename: str) -> Tuple[str, _Digest]:
+        blob_id = uuid.uuid4().hex
+        partial = self._path(blob_id) + ".partial"
+        digest = _Digest()
+        f = await asyncio.to_thread(open, partial, "wb")
+        try:
+            async for chunk in chunks:
+                digest.update(chunk)
+                await asyncio.to_thread(f.write, chunk)
+            await asyncio.to_thread(f.close)
+            os.replace(partial, self._path(blob_id))
+        except BaseException:
+            f.close()
+            os.remove(partial)
+            raise
+        return blob_id, digest
+
+    async def open(self, blob_id: str) -> AsyncIterator[bytes]:
+        try:
+            f = await asyncio.to_thread(open, self._path(blob_id), "rb")
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Attachment content not found")
+
+        async def chunks():
+            try:
+                while chunk := await asyncio.to_thread(f.read, ATTACHMENT_CHUNK_SIZE):
+                    yield chunk
+            finally:
+                f.close()
+        return chunks()
+
+    async def delete(self, blob_id: str) -> None:
+        try:
+            os.remove(self._path(blob_id))
+        except FileNotFoundError:
+            pass
+
+
+def blob_store(db):
+    """Pick the attachment store for a database from get_database()."""
+    if ATTACHMENT_STORE == "local" or isinstance(db, InMemoryDatabase):
+        return LocalBlobStore()
+    return GridFSBlobStore(db)
+
+
+def clean_filename(filename: Optional[str]) -> str:
+    """Keep only the last path component of a client-supplied file name."""
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    return name[:255] or "attachment"
+
+
+class BugAttachments:
+    """Files attached to bugs.
+
+    Contents are streamed into the blob store chunk by chunk, so uploads are
+    never held in memory, and only their metadata is embedded in the bug's
+    `attachments` array, so bug lists stay small.
+    """
+
+    def __init__(self, bug_collection, store):
+        self.bug_collection = bug_collection
+        self.store = store
+
+    async def add(self, bug_id: str, chunks: AsyncIterator[bytes], filename: Optional[str],
+                  content_type: Optional[str]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Store an attachment and record it on the bug. Returns its metadata and the bug's state."""
+        if not await self.bug_collection.find_one({"bug_id": bug_id}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail=f"Bug {bug_id} not found")
+
+        filename = clean_filename(filename)
+        blob_id, digest = await self.store.save((chunk async for chunk in chunks if chunk), filename)
+        attachment = {
+            "attachment_id": blob_id,
+            "filename": filename,
+            "content_type": content_type or "application/octet-stream",
+            "size": digest.size,
+            "sha256": digest.sha256.hexdigest(),
+            "uploaded_at": datetime.utcnow(),
+        }
+        bug = await self.bug_collection.find_one_and_update(
+            {"bug_id": bug_id}, {"$push": {"attachments": attachment}}, projection=STATE_PROJECTION
+        )
+        if bug is None:
+            # The bug went away while the upload ran
+            await self.store.delete(blob_id)
+            raise HTTPException(status_code=404, detail=f"Bug {bug_id} not found")
+        return attachment, bug
+
+    async def get(self, bug_id: str, attachment_id: str) -> Dict[str, Any]:
+        bug = await self.bug_collection.find_one({"bug_id": bug_id}, {"attachments": 1})
+        if not bug:
+            raise HTTPException(status_code=404, detail=f"Bug {bug_id} not found")
+        for attachment in bug.get("attachments", []):
+            if attachment["attachment_id"] == attachment_id:
+                return attachment
+        raise HTTPException(status_code=404, detail=f"Attachment {attachment_id} not found")
+
+    async def open(self, bug_id: str, attachment_id: str) -> Tuple[Dict[str, Any], AsyncIterator[bytes]]:
+        """Get an attachment's metadata and a stream of its contents."""
+        attachment = await self.get(bug_id, attachment_id)
+        return attachment, await self.store.open(attachment_id)
+
+    async def remove(self, bug_id: str, attachment_id: str) -> Dict[str, Any]:
+        """Remove an attachment from the bug and delete its contents. Returns the bug's state."""
+        await self.get(bug_id, attachment_id)
+        bug = await self.bug_collection.find_one_and_update(
+            {"bug_id": bug_id}, {"$pull": {"attachments": {"attachment_id": attachment_id}}},
+            projection=STATE_PROJECTION
+        )
+        await self.store.delete(attachment_id)
+        return bug
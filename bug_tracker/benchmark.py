@@ -0,0 +1,257 @@
+"""Load generator and performance regression check for the bug tracker.
+
+Seeds a scratch database with bugs and employees, drives create, assign,
+update and list workloads through the ASGI app at each concurrency level and
+reports latency (percentiles and a histogram) and MongoDB round trips per
+request:
+
+    python benchmark.py --bugs 5000 --employees 50 --concurrency 1,16,64
+    python benchmark.py --save-baseline benchmark_baseline.json
+    python benchmark.py --baseline benchmark_baseline.json
+
+With --baseline the run exits with status 1 when a scenario's p95 latency or
+round trips per request grew by more than the allowed threshold, so it can
+gate CI. Round trips hardly vary between machines; latency baselines should
+be recorded on the machine that checks them. --skip-latency leaves latency
+out, which is how the committed benchmark_baseline.json is recorded and
+checked by test_benchmark.py.
+
+MONGODB_URL defaults to memory:// here. Against a MongoDB server the run uses
+the MONGODB_DATABASE database (bugtracker_benchmark unless set), which is
+dropped first. The outbox dispatcher and deadline scheduler are stopped so
+only request handling is measured.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Tuple
+
+os.environ.setdefault("MONGODB_URL", "memory://")
+os.environ.setdefault("MONGODB_DATABASE", "bugtracker_benchmark")
+
+import httpx
+
+import main
+from database import DATABASE_NAME, command_counts
+from memory_db import InMemoryDatabase
+
+# Upper bounds of the latency histogram buckets
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+SCENARIOS = ("create", "assign", "update", "list")
+
+# Round trips per request a scenario may gain on top of the relative threshold, for cache-dependent averages
+ROUND_TRIP_SLACK = 0.1
+
+_WORDS = ("login", "page", "crash", "error", "timeout", "button", "upload", "report", "search", "profile",
+          "payment", "email", "export", "slow", "missing", "invalid", "session", "mobile", "render", "cache")
+
+Request = Tuple[str, str, Dict[str, Any]]
+
+
+def bug_text(rng: random.Random) -> Dict[str, str]:
+    return {"title": " ".join(rng.choices(_WORDS, k=4)), "description": " ".join(rng.choices(_WORDS, k=20))}
+
+
+def percentile(samples: List[float], q: float) -> float:
+    return round(samples[min(len(samples) - 1, int(q * len(samples)))], 3) if samples else 0.0
+
+
+def histogram(samples: List[float]) -> Dict[str, int]:
+    counts = Counter()
+    for sample in samples:
+        counts[next((str(bound) for bound in LATENCY_BUCKETS_MS if sample <= bound), "inf")] += 1
+    return {str(bound): counts[str(bound)] for bound in LATENCY_BUCKETS_MS + ("inf",)}
+
+
+class Workloads:
+    """Request generators for each scenario, over the data created by seed()."""
+
+    def __init__(self, rng: random.Random, bugs: int, employees: int):
+        self.rng = rng
+        self.employees = [f"bench-employee-{e}" for e in range(employees)]
+        # Even bugs are assigned while seeding and used for status updates, odd ones for assignments
+        self.assigned = {f"bench-bug-{i}": self.employees[(i // 2) % employees] for i in range(0, bugs, 2)}
+        self.unassigned = [f"bench-bug-{i}" for i in range(1, bugs, 2)]
+        self.statuses = {bug_id: "Pending" for bug_id in self.assigned}
+        self._updates = itertools.cycle(sorted(self.assigned))
+        self._created = itertools.count()
+
+    async def seed(self, client: httpx.AsyncClient, bugs: int) -> None:
+        records = [{"bug_id": f"bench-bug-{i}", "client_id": f"bench-client-{i % 10}", **bug_text(self.rng)}
+                   for i in range(bugs)]
+        response = await client.post("/client/bugs/import", content="\n".join(json.dumps(r) for r in records),
+                                     headers={"Content-Type": "application/x-ndjson"})
+        response.raise_for_status()
+        for employee_id in self.employees:
+            response = await client.post("/manager/employee/create", json={"employee_id": employee_id, "name": employee_id})
+            response.raise_for_status()
+        by_employee: Dict[str, List[str]] = {}
+        for bug_id, employee_id in self.assigned.items():
+            by_employee.setdefault(employee_id, []).append(bug_id)
+        for employee_id, bug_ids in by_employee.items():
+            response = await client.post("/manager/bugs/assign/bulk", json={"employee_id": employee_id, "bug_ids": bug_ids})
+            response.raise_for_status()
+
+    def create(self) -> Request:
+        bug = {"bug_id": f"bench-new-{next(self._created)}", "client_id": "bench-client-0", **bug_text(self.rng)}
+        return "POST", "/client/bugs/create", {"json": bug}
+
+    def assign(self) -> Request:
+        params = {"bug_id": self.rng.choice(self.unassigned), "employee_id": self.rng.choice(self.employees)}
+        return "POST", "/manager/bugs/assign", {"params": params}
+
+    def update(self) -> Request:
+        bug_id = next(self._updates)
+        self.statuses[bug_id] = "In Progress" if self.statuses[bug_id] == "Pending" else "Pending"
+        params = {"bug_id": bug_id, "status": self.statuses[bug_id]}
+        return "POST", f"/employee/{self.assigned[bug_id]}/bugs/update", {"params": params}
+
+    def list(self) -> Request:
+        if self.rng.random() < 0.5:
+            return "GET", f"/employee/{self.rng.choice(self.employees)}/bugs/pending", {}
+        return "GET", "/manager/bugs", {"params": {"status": "Pending", "limit": 50}}
+
+
+async def run_scenario(client: httpx.AsyncClient, name: str, next_request: Callable[[], Request],
+                       requests: int, concurrency: int) -> Dict[str, Any]:
+    """Send `requests` requests from `concurrency` workers and summarize them."""
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+    commands_before = Counter(command_counts(main.db))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            method, url, kwargs = next_request()
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+            errors += response.status_code >= 400
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    commands = Counter(command_counts(main.db))
+    commands.subtract(commands_before)
+    latencies.sort()
+    return {
+        "scenario": name,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": percentile(latencies, 0.5),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": round(latencies[-1], 3),
+        "round_trips": round(sum(commands.values()) / requests, 2),
+        "commands": {command: round(count / requests, 2) for command, count in sorted(commands.items()) if count},
+        "latency_buckets_ms": histogram(latencies),
+    }
+
+
+async def benchmark(args) -> List[Dict[str, Any]]:
+    if not isinstance(main.db, InMemoryDatabase):
+        await main.db.client.drop_database(DATABASE_NAME)
+
+    results = []
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        main.app.state.outbox_task.cancel()
+        main.app.state.deadline_task.cancel()
+        async with httpx.AsyncClient(transport=transport, base_url="http://bug-tracker") as client:
+            workloads = Workloads(random.Random(args.seed), args.bugs, args.employees)
+            await workloads.seed(client, args.bugs)
+            for name in args.scenarios:
+                for concurrency in args.concurrency:
+                    # Each run draws the same requests whichever scenarios run before it
+                    workloads.rng = random.Random(f"{args.seed}-{name}-{concurrency}")
+                    result = await run_scenario(client, name, getattr(workloads, name), args.requests, concurrency)
+                    results.append(result)
+                    print(f"{name:>8} x{concurrency:<4} {result['throughput_rps']:>9} req/s  "
+                          f"p50 {result['p50_ms']:>8} ms  p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  "
+                          f"{result['round_trips']:>6} round trips  {result['errors']} errors")
+    return results
+
+
+def regressions(results: List[Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+                latency_threshold: float, round_trip_threshold: float, check_latency: bool = True) -> List[str]:
+    """Describe every scenario that got slower or chattier than the baseline allows.
+
+    Latency is only compared when the baseline recorded it.
+    """
+    found = []
+    for result in results:
+        key = f"{result['scenario']}@{result['concurrency']}"
+        expected = baseline.get(key)
+        if not expected:
+            continue
+        if check_latency and "p95_ms" in expected and result["p95_ms"] > expected["p95_ms"] * (1 + latency_threshold):
+            found.append(f"{key}: p95 {result['p95_ms']} ms, baseline {expected['p95_ms']} ms")
+        if result["round_trips"] > expected["round_trips"] * (1 + round_trip_threshold) + ROUND_TRIP_SLACK:
+            found.append(f"{key}: {result['round_trips']} round trips per request, baseline {expected['round_trips']}")
+        if result["errors"] > expected.get("errors", 0):
+            found.append(f"{key}: {result['errors']} errors, baseline {expected.get('errors', 0)}")
+    return found
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the bug tracker through its ASGI app")
+    parser.add_argument("--bugs", type=int, default=1000, help="bugs seeded before the run")
+    parser.add_argument("--employees", type=int, default=20, help="employees seeded before the run")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario and concurrency level")
+    parser.add_argument("--concurrency", type=lambda v: [int(c) for c in v.split(",")], default=[1, 16],
+                        help="comma-separated concurrency levels")
+    parser.add_argument("--scenarios", type=lambda v: v.split(","), default=list(SCENARIOS),
+                        help=f"comma-separated scenarios out of {','.join(SCENARIOS)}")
+    parser.add_argument("--seed", type=int, default=1, help="random seed for the generated data")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--save-baseline", help="write the results as a baseline to this file")
+    parser.add_argument("--baseline", help="compare against this baseline and exit 1 on regressions")
+    parser.add_argument("--skip-latency", action="store_true",
+                        help="leave latency out of the saved baseline and the check")
+    parser.add_argument("--latency-threshold", type=float, default=0.25,
+                        help="allowed p95 latency growth over the baseline (0.25 = 25%%)")
+    parser.add_argument("--round-trip-threshold", type=float, default=0.1,
+                        help="allowed growth of round trips per request over the baseline")
+    args = parser.parse_args(argv)
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    if args.bugs < 2 or args.employees < 1:
+        parser.error("need at least 2 bugs and 1 employee")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not os.environ["MONGODB_URL"].startswith("memory://") and DATABASE_NAME == "bugtracker_db":
+        sys.exit("Refusing to benchmark against the service database; set MONGODB_DATABASE to a scratch database")
+
+    results = asyncio.run(benchmark(args))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        keys = ("round_trips", "errors") if args.skip_latency else ("p95_ms", "round_trips", "errors")
+        with open(args.save_baseline, "w") as f:
+            json.dump({f"{r['scenario']}@{r['concurrency']}": {key: r[key] for key in keys} for r in results},
+                      f, indent=2, sort_keys=True)
+            f.write("\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(results, json.load(f), args.latency_threshold, args.round_trip_threshold,
+                                not args.skip_latency)
+        for regression in found:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if found else 0)
@@ -0,0 +1,55 @@
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+
+class BugStatus(str, Enum):
+    PENDING = "Pending"
+    IN_PROGRESS = "In Progress"
+    COMPLETED = "Completed"
+
+
+# Allowed status changes; Completed bugs can only be reopened
+TRANSITIONS: Dict[BugStatus, List[BugStatus]] = {
+    BugStatus.PENDING: [BugStatus.IN_PROGRESS, BugStatus.COMPLETED],
+    BugStatus.IN_PROGRESS: [BugStatus.PENDING, BugStatus.COMPLETED],
+    BugStatus.COMPLETED: [BugStatus.PENDING],
+}
+
+
+def allowed_sources(target: BugStatus) -> List[str]:
+    """Get the statuses a bug may move to `target` from (including `target` itself)."""
+    return [target.value] + [source.value for source, targets in TRANSITIONS.items() if target in targets]
+
+
+def counter_field(status: str) -> str:
+    """Get the employee counter a bug with this status counts towards."""
+    return "bugs_completed" if status == BugStatus.COMPLETED.value else "bugs_pending"
+
+
+def counter_deltas(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]],
+                   count: int = 1) -> Dict[str, Dict[str, int]]:
+    """Compute employee counter changes for `count` bugs moving from state `before` to `after`.
+
+    States are bug documents (only employee_id and status are read); None
+    stands for a bug that doesn't exist yet.
+    """
+    deltas: Dict[str, Dict[str, int]] = {}
+    for state, sign in ((before, -count), (after, count)):
+        if state and state.get("employee_id"):
+            fields = deltas.setdefault(state["employee_id"], {})
+            field = counter_field(state["status"])
+            fields[field] = fields.get(field, 0) + sign
+
+    return {
+        employee_id: {field: delta for field, delta in fields.items() if delta}
+        for employee_id, fields in deltas.items()
+        if any(fields.values())
+    }
+
+
+def merge_deltas(total: Dict[str, Dict[str, int]], deltas: Dict[str, Dict[str, int]]) -> None:
+    """Add one set of counter changes into another in place."""
+    for key, fields in deltas.items():
+        target = total.setdefault(key, {})
+        for field, delta in fields.items():
+            target[field] = target.get(field, 0) + delta
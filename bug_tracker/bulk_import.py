@@ -0,0 +1,142 @@
+import csv
+import json
+import os
+from typing import Any, AsyncIterator, Callable, Dict, List, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+from pymongo.errors import BulkWriteError
+
+# Documents written per insert_many call
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+
+# Validation errors listed in an import report (the total is always counted)
+IMPORT_MAX_REPORTED_ERRORS = int(os.getenv("IMPORT_MAX_REPORTED_ERRORS", 100))
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+async def body_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, bytes]]:
+    """Yield (line number, line) pairs from a stream of bytes, without their line endings."""
+    line_number = 0
+    pending = b""
+    async for chunk in chunks:
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            line_number += 1
+            yield line_number, line.rstrip(b"\r")
+    if pending:
+        yield line_number + 1, pending.rstrip(b"\r")
+
+
+async def parse_records(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (line number, raw record) pairs from an NDJSON or CSV stream as it arrives.
+
+    Malformed lines are yielded as exceptions so they can be reported
+    alongside validation errors without stopping the import.
+    """
+    if fmt == "csv":
+        header, record, quotes = None, [], 0
+        async for line_number, line in body_lines(chunks):
+            record.append(line)
+            quotes += line.count(b'"')
+            if quotes % 2:
+                # A quoted field carries on to the next line
+                continue
+            text, record, quotes = b"\n".join(record), [], 0
+            try:
+                row = next(csv.reader([text.decode("utf-8")]), None)
+            except (UnicodeDecodeError, csv.Error) as e:
+                yield line_number, e
+                continue
+            if not row:
+                continue
+            if header is None:
+                header = row
+            else:
+                yield line_number, dict(zip(header, row))
+        if record:
+            yield line_number, csv.Error("unexpected end of data inside a quoted field")
+        return
+
+    async for line_number, line in body_lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.duplicates = 0
+        self.error_count = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def add_error(self, line: int, error: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+
+async def import_records(records: AsyncIterator[Tuple[int, Any]], model: Type[BaseModel], id_field: str,
+                         collection, on_inserted: Callable,
+                         to_document: Callable[[BaseModel], Dict[str, Any]] = BaseModel.model_dump) -> ImportReport:
+    """Validate records and insert them in unordered batches, skipping duplicate ids.
+
+    `to_document` turns a validated record into the document to insert, and
+    `on_inserted` is awaited with the documents inserted by each batch.
+    """
+    report = ImportReport()
+    batch: Dict[str, Tuple[int, BaseModel]] = {}
+
+    async def flush():
+        lines, items = zip(*batch.values())
+        batch.clear()
+        failed = set()
+        documents = [to_document(item) for item in items]
+        try:
+            await collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details["writeErrors"]:
+                failed.add(error["index"])
+                if error["code"] == DUPLICATE_KEY_ERROR:
+                    report.duplicates += 1
+                else:
+                    report.add_error(lines[error["index"]], error["errmsg"])
+        inserted = [doc for index, doc in enumerate(documents) if index not in failed]
+        report.inserted += len(inserted)
+        if inserted:
+            await on_inserted(inserted)
+
+    async for line, record in records:
+        if isinstance(record, Exception):
+            report.add_error(line, f"Invalid record: {record}")
+            continue
+        try:
+            item = model.model_validate(record)
+        except ValidationError as e:
+            report.add_error(line, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+            continue
+
+        item_id = getattr(item, id_field)
+        if item_id in batch:
+            report.duplicates += 1
+            continue
+        batch[item_id] = (line, item)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await flush()
+
+    if batch:
+        await flush()
+    return report
@@ -0,0 +1,201 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+# Cache backend: "memory://" keeps entries in this process, "redis://host:port/db" shares them between processes
+CACHE_URL = os.getenv("CACHE_URL", "memory://")
+
+# How long a cached response may be served; writes through the service invalidate entries sooner
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", 60))
+
+# Responses kept by the in-process backend before the least recently used are evicted
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 1024))
+
+# Larger responses are streamed without being cached
+CACHE_MAX_BODY_BYTES = int(os.getenv("CACHE_MAX_BODY_BYTES", 1024 * 1024))
+
+# Response headers kept with a cached body
+_CACHED_HEADERS = ("x-next-cursor",)
+
+
+class MemoryCacheBackend:
+    """In-process LRU cache with per-entry expiry; also the stand-in for Redis in local runs and tests."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.versions: Dict[str, int] = {}
+
+    async def get_versions(self, tags: List[str]) -> List[int]:
+        return [self.versions.get(tag, 0) for tag in tags]
+
+    async def incr(self, tags: Iterable[str]) -> None:
+        for tag in tags:
+            self.versions[tag] = self.versions.get(tag, 0) + 1
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+class RedisCacheBackend:
+    """Cache shared by all service processes through Redis (or anything speaking its protocol)."""
+
+    def __init__(self, url: str):
+        # Only needed when a Redis URL is configured
+        import redis.asyncio
+
+        self.redis = redis.asyncio.from_url(url)
+
+    async def get_versions(self, tags: List[str]) -> List[int]:
+        if not tags:
+            return []
+        return [int(version or 0) for version in await self.redis.mget([f"cache:tag:{tag}" for tag in tags])]
+
+    async def incr(self, tags: Iterable[str]) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for tag in tags:
+                pipe.incr(f"cache:tag:{tag}")
+            await pipe.execute()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.redis.get(f"cache:entry:{key}")
+
+    async def set(self, key: str, value: bytes, ttl: int) -> None:
+        await self.redis.set(f"cache:entry:{key}", value, ex=ttl)
+
+
+def get_cache_backend(url: str = CACHE_URL):
+    if url.startswith("memory://"):
+        return MemoryCacheBackend()
+    return RedisCacheBackend(url)
+
+
+def etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _pack(body: bytes, headers: Dict[str, str]) -> bytes:
+    return json.dumps(headers).encode("utf-8") + b"\n" + body
+
+
+def _unpack(value: bytes):
+    header, body = value.split(b"\n", 1)
+    return body, json.loads(header)
+
+
+class ResponseCache:
+    """Read-through cache of GET responses, invalidated by tags.
+
+    An entry is keyed by the request path and query string plus the current
+    version of each tag it depends on (e.g. "employee:e1" for one employee's
+    bugs). Writes bump the versions of the tags they touch, so only the query
+    shapes that can see the change miss the cache. Responses carry an ETag
+    of their body, and a matching If-None-Match gets an empty 304.
+    """
+
+    def __init__(self, backend, ttl: int = CACHE_TTL_SECONDS):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    async def _key(self, request: Request, tags: List[str]) -> str:
+        versions = await self.backend.get_versions(tags)
+        params = sorted(request.query_params.multi_items())
+        shape = json.dumps([request.url.path, params, dict(zip(tags, versions))])
+        return hashlib.blake2b(shape.encode("utf-8"), digest_size=16).hexdigest()
+
+    def _respond(self, request: Request, body: bytes, headers: Dict[str, str]) -> Response:
+        headers = {**headers, "ETag": etag(body), "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="application/json", headers=headers)
+
+    async def respond(self, request: Request, tags: List[str],
+                      build: Callable[[], Awaitable[StreamingResponse]]) -> Response:
+        """Serve the response for `request` from the cache, or build and cache it."""
+        key = await self._key(request, tags)
+        cached = await self.backend.get(key)
+        if cached is not None:
+            self.hits += 1
+            body, headers = _unpack(cached)
+            return self._respond(request, body, headers)
+
+        self.misses += 1
+        response = await build()
+        if response.status_code != 200:
+            return response
+
+        chunks, size = [], 0
+        body_iterator = response.body_iterator.__aiter__()
+        async for chunk in body_iterator:
+            chunk = chunk if isinstance(chunk, bytes) else chunk.encode("utf-8")
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > CACHE_MAX_BODY_BYTES:
+                # Too big to keep: send what was read and stream the rest
+                async def rest():
+                    for part in chunks:
+                        yield part
+                    async for part in body_iterator:
+                        yield part
+                return StreamingResponse(rest(), status_code=response.status_code,
+                                         media_type=response.media_type, headers=dict(response.headers))
+
+        body = b"".join(chunks)
+        headers = {name: response.headers[name] for name in _CACHED_HEADERS if name in response.headers}
+        await self.backend.set(key, _pack(body, headers), self.ttl)
+        return self._respond(request, body, headers)
+
+    async def invalidate(self, tags: Iterable[str]) -> None:
+        tags = sorted(set(tags))
+        if tags:
+            await self.backend.incr(tags)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "not_modified": self.not_modified}
+
+
+def bug_list_tags(status: Optional[str] = None, employee_id: Optional[str] = None) -> List[str]:
+    """Tags a bug list depends on: the narrowest of its employee, its status or all bugs."""
+    if employee_id:
+        return [f"employee:{employee_id}"]
+    if status:
+        return [f"status:{status}"]
+    return ["bugs"]
+
+
+def bug_change_tags(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> List[str]:
+    """Tags to invalidate when a bug moves from state `before` to `after` (None for a bug that doesn't exist)."""
+    tags = ["bugs"]
+    for state in (before, after):
+        if state:
+            tags.append(f"status:{state['status']}")
+            if state.get("employee_id"):
+                tags.append(f"employee:{state['employee_id']}")
+    return tags
@@ -0,0 +1,117 @@
+import logging
+import os
+from collections import Counter
+from contextlib import asynccontextmanager
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from memory_db import InMemoryDatabase
+
+# MongoDB setup ("memory://" selects the in-memory stand-in)
+MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+DATABASE_NAME = os.getenv("MONGODB_DATABASE", "bugtracker_db")
+
+# Connection pool tuning
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", 100))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", 10))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", 60000))
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", 5000))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 5000))
+
+# Use multi-document transactions for writes that must land together (requires a replica set)
+MONGODB_TRANSACTIONS = os.getenv("MONGODB_TRANSACTIONS", "false").lower() == "true"
+
+# Commands slower than this are logged
+SLOW_QUERY_MS = int(os.getenv("SLOW_QUERY_MS", 100))
+
+logger = logging.getLogger(__name__)
+
+# Commands whose filters are worth logging when they run slowly
+_QUERY_COMMANDS = {"find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"}
+
+
+class SlowQueryLogger(monitoring.CommandListener):
+    """Log MongoDB commands that take longer than SLOW_QUERY_MS."""
+
+    def __init__(self, threshold_ms: int = SLOW_QUERY_MS):
+        self.threshold_ms = threshold_ms
+        self._commands = {}
+
+    def started(self, event):
+        if event.command_name in _QUERY_COMMANDS:
+            self._commands[event.request_id] = event.command
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
+
+    def _finish(self, event):
+        command = self._commands.pop(event.request_id, None)
+        duration_ms = event.duration_micros / 1000
+        if command is None or duration_ms < self.threshold_ms:
+            return
+        collection = command.get(event.command_name)
+        query = command.get("filter") or command.get("query") or command.get("pipeline") or command.get("updates")
+        logger.warning(f"Slow MongoDB {event.command_name} on {collection} ({duration_ms:.1f} ms): {query}")
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Count the MongoDB commands sent (i.e. round trips), per command name."""
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+
+    def started(self, event):
+        self.counts[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+# Commands sent through every client created by get_database()
+command_counter = CommandCounter()
+
+
+def command_counts(db) -> Counter:
+    """Get the number of commands sent so far through a database from get_database(), per command name."""
+    if isinstance(db, InMemoryDatabase):
+        return db.commands
+    return command_counter.counts
+
+
+def get_database(url: str = MONGODB_URL):
+    """Connect to the bug tracker database using a pooled async client."""
+    if url.startswith("memory://"):
+        return InMemoryDatabase(DATABASE_NAME)
+
+    client = AsyncIOMotorClient(
+        url,
+        maxPoolSize=MONGODB_MAX_POOL_SIZE,
+        minPoolSize=MONGODB_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGODB_MAX_IDLE_TIME_MS,
+        waitQueueTimeoutMS=MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        event_listeners=[SlowQueryLogger(), command_counter],
+    )
+    return client[DATABASE_NAME]
+
+
+@asynccontextmanager
+async def transaction(db):
+    """Yield a session whose writes commit together, or None if transactions are disabled.
+
+    Without transactions the writes are applied one by one in the order issued.
+    """
+    if not MONGODB_TRANSACTIONS or isinstance(db, InMemoryDatabase):
+        yield None
+        return
+
+    async with await db.client.start_session() as session:
+        async with session.start_transaction():
+            yield session
@@ -0,0 +1,145 @@
+import asyncio
+import heapq
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from bug_status import BugStatus
+from stats import BUG_DEADLINE_DAYS, STATE_PROJECTION
+
+logger = logging.getLogger(__name__)
+
+# Deadlines this far ahead are kept in memory; later ones are loaded as the window moves
+SCHEDULER_HORIZON_SECONDS = float(os.getenv("SCHEDULER_HORIZON_SECONDS", 3600))
+
+# Overdue bugs marked (and reported) per round
+DEADLINE_BATCH_SIZE = int(os.getenv("DEADLINE_BATCH_SIZE", 1000))
+
+
+def utc_naive(value: datetime) -> datetime:
+    """Convert a datetime to naive UTC, the form stored in MongoDB (naive values are taken as UTC)."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    # MongoDB stores milliseconds
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+def default_due_at() -> datetime:
+    return utc_naive(datetime.utcnow() + timedelta(days=BUG_DEADLINE_DAYS))
+
+
+class DeadlineScheduler:
+    """Marks bugs overdue when their due_at passes, without sweeping the bug collection.
+
+    Upcoming deadlines within SCHEDULER_HORIZON_SECONDS are loaded from the
+    due_at index into a min-heap; the dispatcher sleeps until the earliest one,
+    then marks every bug due by then in one update and hands them to
+    `on_overdue` as a batch. Each refill only reads the slice of the index
+    that entered the window, so the work is proportional to the bugs falling
+    due. Marking uses `overdue_at`, so each bug is reported once even with
+    several service processes.
+    """
+
+    def __init__(self, collection, on_overdue: Callable[[List[Dict[str, Any]]], Awaitable[None]]):
+        self.collection = collection
+        self.on_overdue = on_overdue
+        self.heap: List[Tuple[datetime, str]] = []
+        self.loaded_until: Optional[datetime] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @staticmethod
+    def _pending(due: Dict[str, Any]) -> Dict[str, Any]:
+        return {"due_at": due, "status": {"$ne": BugStatus.COMPLETED.value}, "overdue_at": {"$exists": False}}
+
+    def schedule(self, bug_id: str, due_at: datetime) -> None:
+        """Track a deadline that falls inside the loaded window (later ones are picked up by the next refill).
+
+        Call this when a bug is created or reopened.
+        """
+        if self.loaded_until is None or due_at >= self.loaded_until:
+            return
+        if not self.heap or due_at < self.heap[0][0]:
+            self.notify()
+        heapq.heappush(self.heap, (due_at, bug_id))
+
+    def notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def backfill(self) -> int:
+        """Give bugs created before deadlines were stored the default deadline from their creation time."""
+        filled, requests = 0, []
+        async for bug in self.collection.find({"due_at": {"$exists": False}}, {"_id": 1}):
+            due_at = bug["_id"].generation_time.replace(tzinfo=None) + timedelta(days=BUG_DEADLINE_DAYS)
+            requests.append(UpdateOne({"_id": bug["_id"], "due_at": {"$exists": False}}, {"$set": {"due_at": due_at}}))
+            if len(requests) >= DEADLINE_BATCH_SIZE:
+                await self.collection.bulk_write(requests, ordered=False)
+                filled += len(requests)
+                requests = []
+        if requests:
+            await self.collection.bulk_write(requests, ordered=False)
+            filled += len(requests)
+        if filled:
+            logger.info(f"Set default deadlines on {filled} bugs")
+        return filled
+
+    async def refill(self, now: datetime) -> None:
+        """Load the deadlines that entered the window since the last refill."""
+        until = now + timedelta(seconds=SCHEDULER_HORIZON_SECONDS)
+        due = {"$lt": until}
+        if self.loaded_until is not None:
+            due["$gte"] = self.loaded_until
+        async for bug in self.collection.find(self._pending(due), {"bug_id": 1, "due_at": 1}):
+            heapq.heappush(self.heap, (bug["due_at"], bug["bug_id"]))
+        self.loaded_until = until
+
+    async def fire_due(self, now: datetime) -> int:
+        """Mark every bug due by `now` as overdue and report them. Returns how many were marked."""
+        bug_ids = set()
+        while self.heap and self.heap[0][0] <= now:
+            bug_ids.add(heapq.heappop(self.heap)[1])
+
+        marked = 0
+        ids = sorted(bug_ids)
+        for start in range(0, len(ids), DEADLINE_BATCH_SIZE):
+            batch = ids[start:start + DEADLINE_BATCH_SIZE]
+            # Bugs completed, reopened with a later deadline or already marked elsewhere are skipped
+            stamp = utc_naive(datetime.utcnow())
+            await self.collection.update_many(
+                {"bug_id": {"$in": batch}, **self._pending({"$lte": now})},
+                {"$set": {"overdue_at": stamp}}
+            )
+            overdue = await self.collection.find(
+                {"bug_id": {"$in": batch}, "overdue_at": stamp}, STATE_PROJECTION
+            ).to_list(length=None)
+            if overdue:
+                await self.on_overdue(overdue)
+            marked += len(overdue)
+        return marked
+
+    async def run(self) -> None:
+        """Fire deadlines until cancelled."""
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                now = datetime.utcnow()
+                if self.loaded_until is None or now + timedelta(seconds=SCHEDULER_HORIZON_SECONDS / 2) >= self.loaded_until:
+                    await self.refill(now)
+                marked = await self.fire_due(now)
+                if marked:
+                    logger.info(f"Marked {marked} bugs overdue")
+                next_refill = self.loaded_until - timedelta(seconds=SCHEDULER_HORIZON_SECONDS / 2)
+                wake_at = min(self.heap[0][0], next_refill) if self.heap else next_refill
+                delay = max(0.0, (wake_at - datetime.utcnow()).total_seconds())
+            except Exception as e:
+                logger.error(f"Deadline scheduler failed: {e}")
+                delay = SCHEDULER_HORIZON_SECONDS / 60
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
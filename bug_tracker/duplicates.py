@@ -0,0 +1,144 @@
+import asyncio
+import hashlib
+import logging
+import os
+import random
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from pymongo import UpdateOne
+
+from search import tokenize
+
+logger = logging.getLogger(__name__)
+
+# LSH layout: signatures have BANDS * ROWS hashes; bugs sharing any band are compared.
+# 16 bands of 4 rows makes bugs about 50% similar likely to be compared.
+DUPLICATE_BANDS = int(os.getenv("DUPLICATE_BANDS", 16))
+DUPLICATE_ROWS = int(os.getenv("DUPLICATE_ROWS", 4))
+
+# Estimated similarity a bug must reach to be reported as a likely duplicate
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", 0.5))
+
+# Likely duplicates reported per bug
+DUPLICATE_TOP_K = int(os.getenv("DUPLICATE_TOP_K", 5))
+
+# Words per shingle
+SHINGLE_SIZE = 3
+
+# Bugs hashed per round when signatures are computed in bulk
+_BATCH_SIZE = 1000
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+                 for _ in range(DUPLICATE_BANDS * DUPLICATE_ROWS)]
+
+# Signature of a bug without any words; such bugs are never reported as duplicates
+_EMPTY_SIGNATURE = array("Q", [_PRIME] * len(_PERMUTATIONS))
+
+
+def shingles(bug: Dict[str, Any]) -> Set[str]:
+    """Get the overlapping word n-grams of a bug's title and description."""
+    words = tokenize(f"{bug.get('title') or ''} {bug.get('description') or ''}")
+    if len(words) <= SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def signature(bug: Dict[str, Any]) -> array:
+    """Compute the MinHash signature of a bug's shingles."""
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big")
+              for s in shingles(bug)]
+    if not hashes:
+        return array("Q", _EMPTY_SIGNATURE)
+    return array("Q", [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS])
+
+
+def similarity(first: array, second: array) -> float:
+    """Estimate the Jaccard similarity of two bugs from their signatures."""
+    return sum(x == y for x, y in zip(first, second)) / len(first)
+
+
+class DuplicateIndex:
+    """MinHash/LSH index of bug signatures for finding near-duplicate bugs.
+
+    Signatures are persisted in their own collection and written together with
+    the bug, so `load()` rebuilds the in-memory LSH buckets without rehashing
+    every bug. Each service process keeps its own copy of the buckets, so bugs
+    created by another process are only found after that process' next load.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.signatures: Dict[str, array] = {}
+        self.buckets: Dict[Tuple[int, bytes], Set[str]] = {}
+
+    def _bands(self, sig: array) -> Iterable[Tuple[int, bytes]]:
+        for band in range(DUPLICATE_BANDS):
+            yield band, sig[band * DUPLICATE_ROWS:(band + 1) * DUPLICATE_ROWS].tobytes()
+
+    def _add(self, bug_id: str, sig: array) -> None:
+        self.signatures[bug_id] = sig
+        if sig == _EMPTY_SIGNATURE:
+            return
+        for key in self._bands(sig):
+            self.buckets.setdefault(key, set()).add(bug_id)
+
+    async def load(self, bug_collection) -> None:
+        """Load persisted signatures, computing any that are missing (e.g. bugs created before this index)."""
+        size = len(_PERMUTATIONS)
+        async for doc in self.collection.find({}):
+            sig = array("Q")
+            sig.frombytes(doc["signature"])
+            if len(sig) == size:
+                self._add(doc["bug_id"], sig)
+
+        missing, computed = [], 0
+        async for bug in bug_collection.find({}, {"bug_id": 1, "title": 1, "description": 1}):
+            if bug["bug_id"] not in self.signatures:
+                missing.append(bug)
+            if len(missing) >= _BATCH_SIZE:
+                await self.add(missing)
+                computed += len(missing)
+                missing = []
+        if missing:
+            await self.add(missing)
+            computed += len(missing)
+        if computed:
+            logger.info(f"Computed duplicate signatures for {computed} bugs")
+
+    def entries(self, bugs: List[Dict[str, Any]]) -> List[Tuple[str, array]]:
+        """Compute (bug id, signature) pairs for new bugs."""
+        return [(bug["bug_id"], signature(bug)) for bug in bugs]
+
+    async def save(self, entries: List[Tuple[str, array]], session=None) -> None:
+        """Persist signatures and add them to the index."""
+        if not entries:
+            return
+        await self.collection.bulk_write([
+            UpdateOne({"bug_id": bug_id}, {"$set": {"signature": sig.tobytes()}}, upsert=True)
+            for bug_id, sig in entries
+        ], ordered=False, session=session)
+        for bug_id, sig in entries:
+            self._add(bug_id, sig)
+
+    async def add(self, bugs: List[Dict[str, Any]], session=None) -> None:
+        """Compute, persist and index the signatures of new bugs.
+
+        Hashing runs in a worker thread so large batches don't stall other requests.
+        """
+        await self.save(await asyncio.to_thread(self.entries, bugs), session=session)
+
+    def find(self, sig: array, exclude: Optional[str] = None, k: int = DUPLICATE_TOP_K) -> List[Tuple[str, float]]:
+        """Get up to k (bug id, similarity) pairs at or above DUPLICATE_THRESHOLD, most similar first."""
+        if sig == _EMPTY_SIGNATURE:
+            return []
+        candidates: Set[str] = set()
+        for key in self._bands(sig):
+            candidates |= self.buckets.get(key, set())
+        candidates.discard(exclude)
+
+        scored = [(bug_id, similarity(sig, self.signatures[bug_id])) for bug_id in candidates]
+        matches = [(bug_id, score) for bug_id, score in scored if score >= DUPLICATE_THRESHOLD]
+        return sorted(matches, key=lambda item: (-item[1], item[0]))[:k]
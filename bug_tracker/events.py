@@ -0,0 +1,183 @@
+import os
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from bug_status import BugStatus
+
+# Events stored per bucket document
+EVENT_BUCKET_SIZE = int(os.getenv("EVENT_BUCKET_SIZE", 100))
+
+# Bugs looked up per round when a report needs their creation events
+_REPORT_BATCH_SIZE = 500
+
+
+def _now() -> datetime:
+    # MongoDB stores milliseconds; truncate so stored and in-memory times compare equal
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def change_events(before: Optional[Dict[str, Any]], after: Dict[str, Any],
+                  by: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Describe a bug moving from state `before` (None for a new bug) to `after` as log events.
+
+    Events are compact: `t` is the time, `k` the kind ("create", "assign" or
+    "status"; the deadline scheduler logs "overdue" itself), `from`/`to` the
+    old and new value and `by` who made the change (for a new bug, its client
+    unless given). Unset values are left out.
+    """
+    t = _now()
+    if before is None:
+        by = by or after.get("client_id")
+        events = [{"t": t, "k": "create", "to": after["status"], "employee": after.get("employee_id")}]
+    else:
+        events = []
+        if before.get("employee_id") != after.get("employee_id"):
+            events.append({"t": t, "k": "assign", "from": before.get("employee_id"), "to": after.get("employee_id")})
+        if before["status"] != after["status"]:
+            events.append({"t": t, "k": "status", "from": before["status"], "to": after["status"]})
+    for event in events:
+        event["by"] = by
+    return [{key: value for key, value in event.items() if value is not None} for event in events]
+
+
+def replay(events: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Rebuild a bug's state from its events, oldest first."""
+    state: Dict[str, Any] = {}
+    for event in events:
+        if event["k"] == "create":
+            state.update(status=event["to"], employee_id=event.get("employee"), created_at=event["t"])
+        elif event["k"] == "assign":
+            state["employee_id"] = event.get("to")
+        elif event["k"] == "status":
+            state["status"] = event["to"]
+            if event["to"] == BugStatus.COMPLETED.value:
+                state["completed_at"] = event["t"]
+            else:
+                state.pop("completed_at", None)
+        elif event["k"] == "overdue":
+            state["overdue_at"] = event["t"]
+        state["updated_at"] = event["t"]
+    return state
+
+
+class BugEventLog:
+    """Append-only history of bug changes.
+
+    Events for one bug are pushed into bucket documents of up to
+    EVENT_BUCKET_SIZE events, each carrying the time range it covers, so the
+    log stays small, never touches the bug documents and time-range queries
+    only read the buckets that overlap the range.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def append(self, events: List[Tuple[str, Dict[str, Any]]], session=None) -> None:
+        """Append (bug_id, event) pairs, with one write per bug."""
+        per_bug: Dict[str, List[Dict[str, Any]]] = {}
+        for bug_id, event in events:
+            per_bug.setdefault(bug_id, []).append(event)
+        requests = [
+            UpdateOne(
+                {"bug_id": bug_id, "count": {"$lt": EVENT_BUCKET_SIZE}},
+                {
+                    "$push": {"events": {"$each": bug_events}},
+                    "$inc": {"count": len(bug_events)},
+                    "$min": {"start": min(e["t"] for e in bug_events)},
+                    "$max": {"end": max(e["t"] for e in bug_events)},
+                },
+                upsert=True
+            )
+            for bug_id, bug_events in per_bug.items()
+        ]
+        if requests:
+            await self.collection.bulk_write(requests, ordered=False, session=session)
+
+    @staticmethod
+    def _range_query(since: Optional[datetime], until: Optional[datetime]) -> Dict[str, Any]:
+        query = {}
+        if since:
+            query["end"] = {"$gte": since}
+        if until:
+            query["start"] = {"$lt": until}
+        return query
+
+    @staticmethod
+    def _in_range(event: Dict[str, Any], since: Optional[datetime], until: Optional[datetime]) -> bool:
+        return (not since or event["t"] >= since) and (not until or event["t"] < until)
+
+    async def history(self, bug_id: str, since: Optional[datetime] = None,
+                      until: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        """Get a bug's events in [since, until), oldest first."""
+        buckets = self.collection.find({"bug_id": bug_id, **self._range_query(since, until)}).sort("start", 1)
+        events = [event async for bucket in buckets for event in bucket["events"]
+                  if self._in_range(event, since, until)]
+        return sorted(events, key=lambda event: event["t"])
+
+    async def events(self, since: Optional[datetime] = None,
+                     until: Optional[datetime] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream the events of all bugs in [since, until), each with its bug_id, bucket by bucket."""
+        async for bucket in self.collection.find(self._range_query(since, until)):
+            for event in bucket["events"]:
+                if self._in_range(event, since, until):
+                    yield {"bug_id": bucket["bug_id"], **event}
+
+    async def _created_at(self, bug_ids: List[str]) -> Dict[str, datetime]:
+        """Find when bugs were created from their create events.
+
+        Every bucket of these bugs is read, oldest first, since buckets aren't
+        indexed by event kind; callers batch the ids to bound each query.
+        """
+        created = {}
+        buckets = self.collection.find({"bug_id": {"$in": bug_ids}}).sort("start", 1)
+        async for bucket in buckets:
+            if bucket["bug_id"] in created:
+                continue
+            for event in bucket["events"]:
+                if event["k"] == "create":
+                    created[bucket["bug_id"]] = event["t"]
+                    break
+        return created
+
+    async def cycle_time_report(self, since: Optional[datetime], until: Optional[datetime],
+                                bug_collection, default_deadline: timedelta) -> Dict[str, Any]:
+        """Summarize how long bugs completed in [since, until) took from creation to completion.
+
+        The completions in range and the creation times come from the log. A
+        bug is within its deadline if it was completed by its `due_at`, read
+        from `bug_collection`; bugs without one are given `default_deadline`
+        from creation.
+        """
+        completed: Dict[str, datetime] = {}
+        async for event in self.events(since, until):
+            if event["k"] == "status" and event["to"] == BugStatus.COMPLETED.value:
+                completed[event["bug_id"]] = max(event["t"], completed.get(event["bug_id"], event["t"]))
+
+        ids = list(completed)
+        hours, within_deadline = [], 0
+        for start in range(0, len(ids), _REPORT_BATCH_SIZE):
+            batch = ids[start:start + _REPORT_BATCH_SIZE]
+            created = await self._created_at(batch)
+            due = {bug["bug_id"]: bug.get("due_at") async for bug in bug_collection.find(
+                {"bug_id": {"$in": batch}}, {"_id": 0, "bug_id": 1, "due_at": 1}
+            )}
+            for bug_id, created_at in created.items():
+                hours.append((completed[bug_id] - created_at).total_seconds() / 3600)
+                within_deadline += completed[bug_id] <= (due.get(bug_id) or created_at + default_deadline)
+
+        hours.sort()
+
+        def percentile(q: float) -> Optional[float]:
+            return round(hours[min(len(hours) - 1, int(q * len(hours)))], 2) if hours else None
+
+        return {
+            "completed": len(hours),
+            "within_deadline": within_deadline,
+            "mean_hours": round(sum(hours) / len(hours), 2) if hours else None,
+            "p50_hours": percentile(0.5),
+            "p90_hours": percentile(0.9),
+            "max_hours": round(hours[-1], 2) if hours else None,
+        }
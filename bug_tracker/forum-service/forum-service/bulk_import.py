@@ -0,0 +1,137 @@
+"""Bulk import of NDJSON topic and post streams.
+
+Records are parsed and validated as the request body arrives, and written
+in batches: one query to find the ids that already exist, one multi-row
+INSERT (executemany) for the rest and one commit per batch, so an import
+never holds the whole upload or one huge transaction.
+"""
+import json
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+# Records written per batch (and transaction)
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+
+# Errors listed in an import report (the total is always counted)
+IMPORT_MAX_REPORTED_ERRORS = int(os.getenv("IMPORT_MAX_REPORTED_ERRORS", 100))
+
+
+async def ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Any]]:
+    """Yield (line number, record) pairs from a stream of NDJSON bytes.
+
+    Malformed lines are yielded as exceptions so they can be reported
+    alongside validation errors without stopping the import.
+    """
+    line_number = 0
+    pending = b""
+
+    def parse(line: bytes):
+        try:
+            return json.loads(line)
+        except ValueError as e:
+            return e
+
+    async for chunk in chunks:
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, parse(line)
+    if pending.strip():
+        yield line_number + 1, parse(pending)
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.duplicates = 0
+        self.error_count = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def add_error(self, line: int, error: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": error})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "error_count": self.error_count,
+            "errors": self.errors,
+        }
+
+
+async def import_records(
+    db,
+    records: AsyncIterator[Tuple[int, Any]],
+    model: Type[BaseModel],
+    table,
+    to_row: Callable[[BaseModel], Dict[str, Any]],
+    reject: Optional[Callable[[Any, List[Dict[str, Any]]], Awaitable[Dict[int, str]]]] = None,
+    on_inserted: Optional[Callable[[Any, List[Dict[str, Any]]], Awaitable[None]]] = None,
+) -> ImportReport:
+    """Validate records into rows of `table` and insert them in batches, skipping ids that exist.
+
+    `to_row` turns a validated record into a row (generating its id if it has
+    none). `reject` may return errors by batch index for rows that can't be
+    inserted, and `on_inserted` is awaited with each batch's inserted rows in
+    the batch's transaction.
+    """
+    report = ImportReport()
+    batch: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+
+    async def flush():
+        lines, rows = zip(*batch.values())
+        batch.clear()
+        existing = set((await db.execute(select(table.id).where(table.id.in_([row["id"] for row in rows])))).scalars())
+        rejected = await reject(db, list(rows)) if reject else {}
+        accepted = []
+        for index, (line, row) in enumerate(zip(lines, rows)):
+            if row["id"] in existing:
+                report.duplicates += 1
+            elif index in rejected:
+                report.add_error(line, rejected[index])
+            else:
+                accepted.append((line, row))
+        if not accepted:
+            return
+
+        try:
+            await db.execute(insert(table), [row for _, row in accepted])
+            if on_inserted:
+                await on_inserted(db, [row for _, row in accepted])
+            await db.commit()
+        except IntegrityError as e:
+            # Most likely rows written concurrently with the same ids; the batch is skipped as a whole
+            await db.rollback()
+            for line, _ in accepted:
+                report.add_error(line, f"Not inserted: {e.orig}")
+            return
+        report.inserted += len(accepted)
+
+    async for line, record in records:
+        if isinstance(record, Exception):
+            report.add_error(line, f"Invalid JSON: {record}")
+            continue
+        try:
+            row = to_row(model.parse_obj(record))
+        except ValidationError as e:
+            report.add_error(line, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+            continue
+
+        if row["id"] in batch:
+            report.duplicates += 1
+            continue
+        batch[row["id"]] = (line, row)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await flush()
+
+    if batch:
+        await flush()
+    return report
@@ -0,0 +1,246 @@
+"""Durable queue of calendar changes for forum topics.
+
+Changes are added to the `calendar_outbox` table in the same transaction as
+the topic write that caused them, so requests commit once and never wait for
+the calendar service. `CalendarOutbox.run()` delivers them in the
+background: it leases a batch of due entries, merges the entries of each
+topic into one request, sends the batch concurrently and records every
+outcome in one transaction, retrying failures with exponential backoff.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text, and_, delete, func, or_, select, update
+
+import service_client
+from database import Base, SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Dispatcher tuning
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 100))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", 2))
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", 10))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 10))
+OUTBOX_BACKOFF_BASE_SECONDS = float(os.getenv("OUTBOX_BACKOFF_BASE_SECONDS", 1))
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", 300))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", 60))
+CALENDAR_TIMEOUT_SECONDS = float(os.getenv("CALENDAR_TIMEOUT_SECONDS", 5))
+
+
+class OutboxDB(Base):
+    __tablename__ = "calendar_outbox"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    reference_id = Column(String, nullable=False, index=True)  # Topic id, the calendar event's referenceId
+    action = Column(String, nullable=False)  # "create" (create or update the event) or "delete"
+    payload = Column(Text, nullable=False)  # JSON event fields
+    status = Column(String, nullable=False, default="pending")  # pending, in_flight or failed
+    attempts = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow)
+    claim = Column(String, nullable=True)
+    locked_until = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    __table_args__ = (Index("ix_calendar_outbox_status_next_attempt_at", "status", "next_attempt_at"),)
+
+
+class DeliveryError(Exception):
+    """Raised when the calendar service rejects or fails an outbox delivery."""
+
+
+def backoff_delay(attempts: int) -> float:
+    """Exponential backoff with full jitter for the given number of failed attempts."""
+    return random.uniform(0, min(OUTBOX_BACKOFF_MAX_SECONDS, OUTBOX_BACKOFF_BASE_SECONDS * 2 ** attempts))
+
+
+def coalesce(entries: List[OutboxDB]) -> Tuple[str, Dict[str, Any]]:
+    """Merge the queued changes for one calendar event into a single request.
+
+    Creates and updates become one create carrying the final state, unless a
+    delete comes last, which drops everything queued before it.
+    """
+    action, payload = "delete", {}
+    for entry in entries:
+        if entry.action == "delete":
+            action, payload = "delete", {}
+        else:
+            action = "create"
+            payload.update(json.loads(entry.payload))
+    return action, payload
+
+
+# Called with the dispatcher's session, the reference id, the action and the calendar's response
+# after each delivery, to record the outcome in the same transaction as the outbox cleanup
+OnDelivered = Callable[[Any, str, str, Dict[str, Any]], Awaitable[None]]
+
+
+class CalendarOutbox:
+    """Calendar changes queued with topic writes and delivered by `run()`.
+
+    The topic id is the calendar `referenceId` and acts as the idempotency
+    key: creates are sent as an update-by-reference first and only posted
+    when the event does not exist yet, and deleting a missing event counts as
+    done, so retries never duplicate or fail forever.
+    """
+
+    def __init__(self, calendar_url: str, on_delivered: Optional[OnDelivered] = None):
+        # Retries are handled by the outbox's own backoff, so the client sends each attempt once
+        self.calendar = service_client.service("calendar", calendar_url, timeout=CALENDAR_TIMEOUT_SECONDS, retries=0)
+        self.on_delivered = on_delivered
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def enqueue(self, db, reference_id: str, action: str, payload: Dict[str, Any]) -> None:
+        """Add a change to the caller's session; it is queued when the caller commits."""
+        db.add(OutboxDB(reference_id=reference_id, action=action, payload=json.dumps(payload, default=str)))
+
+    def notify(self) -> None:
+        """Wake the dispatcher so new entries are delivered without waiting for the next poll."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run(self) -> None:
+        """Deliver outbox entries until cancelled."""
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                attempted = await self.dispatch_once()
+            except Exception as e:
+                logger.error(f"Outbox dispatch failed: {e}")
+                attempted = 0
+
+            # Keep draining while batches are full, otherwise wait for new work
+            if attempted < OUTBOX_BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), OUTBOX_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def dispatch_once(self) -> int:
+        """Claim one batch of due entries and deliver it. Returns the number of entries attempted."""
+        async with SessionLocal() as db:
+            claimed = await self._claim_batch(db)
+            if not claimed:
+                return 0
+
+            groups: Dict[str, List[OutboxDB]] = {}
+            for entry in claimed:
+                groups.setdefault(entry.reference_id, []).append(entry)
+            await self._release_out_of_order(db, claimed[0].claim, groups)
+
+            semaphore = asyncio.Semaphore(OUTBOX_CONCURRENCY)
+
+            async def deliver_group(reference_id: str, entries: List[OutboxDB]):
+                async with semaphore:
+                    return await self._deliver_group(reference_id, entries)
+
+            outcomes = await asyncio.gather(*(deliver_group(ref, entries) for ref, entries in groups.items()))
+            for outcome in outcomes:
+                await self._record(db, *outcome)
+            await db.commit()
+            return sum(len(entries) for entries in groups.values())
+
+    async def _claim_batch(self, db) -> List[OutboxDB]:
+        """Lease a batch of due entries so concurrent dispatchers don't deliver them twice."""
+        now = datetime.utcnow()
+        due = or_(
+            and_(OutboxDB.status == "pending", OutboxDB.next_attempt_at <= now),
+            and_(OutboxDB.status == "in_flight", OutboxDB.locked_until <= now),
+        )
+        # Rows another dispatcher is claiming are skipped rather than waited for (PostgreSQL)
+        candidates = (
+            select(OutboxDB.id).where(due).order_by(OutboxDB.id)
+            .limit(OUTBOX_BATCH_SIZE).with_for_update(skip_locked=True)
+        )
+        token = uuid.uuid4().hex
+        await db.execute(
+            update(OutboxDB).where(OutboxDB.id.in_(candidates), due)
+            .values(status="in_flight", claim=token, locked_until=now + timedelta(seconds=OUTBOX_LEASE_SECONDS))
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        return (await db.execute(select(OutboxDB).where(OutboxDB.claim == token).order_by(OutboxDB.id))).scalars().all()
+
+    async def _release_out_of_order(self, db, token: str, groups: Dict[str, List[OutboxDB]]) -> None:
+        """Hand back groups that have an older undelivered entry held elsewhere.
+
+        This keeps changes to one calendar event in order, e.g. a delete is
+        never sent while the create before it is still being retried.
+        """
+        oldest = await db.execute(
+            select(OutboxDB.reference_id, func.min(OutboxDB.id))
+            .where(
+                OutboxDB.reference_id.in_(list(groups)),
+                or_(OutboxDB.claim.is_(None), OutboxDB.claim != token),
+                OutboxDB.status != "failed",
+            )
+            .group_by(OutboxDB.reference_id)
+        )
+        blocked = [ref for ref, oldest_id in oldest if oldest_id < groups[ref][0].id]
+        if not blocked:
+            return
+
+        ids = [entry.id for ref in blocked for entry in groups.pop(ref)]
+        await db.execute(
+            update(OutboxDB).where(OutboxDB.id.in_(ids)).values(status="pending", claim=None)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+    async def _deliver_group(self, reference_id: str, entries: List[OutboxDB]):
+        """Send the merged change for one topic. Returns what _record needs to store the outcome."""
+        action, payload = coalesce(entries)
+        try:
+            result = await self._send(reference_id, action, payload)
+        except Exception as e:
+            return reference_id, entries, action, None, e
+        return reference_id, entries, action, result, None
+
+    async def _record(self, db, reference_id: str, entries: List[OutboxDB], action: str,
+                      result: Optional[Dict[str, Any]], error: Optional[Exception]) -> None:
+        ids = [entry.id for entry in entries]
+        if error is None:
+            await db.execute(delete(OutboxDB).where(OutboxDB.id.in_(ids)).execution_options(synchronize_session=False))
+            if self.on_delivered is not None:
+                await self.on_delivered(db, reference_id, action, result)
+            return
+
+        attempts = max(entry.attempts for entry in entries) + 1
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            logger.error(f"Giving up on calendar {action} for topic {reference_id} after {attempts} attempts: {error}")
+            values = {"status": "failed"}
+        else:
+            logger.warning(f"Calendar {action} for topic {reference_id} failed (attempt {attempts}): {error}")
+            values = {"status": "pending", "next_attempt_at": datetime.utcnow() + timedelta(seconds=backoff_delay(attempts))}
+        await db.execute(
+            update(OutboxDB).where(OutboxDB.id.in_(ids))
+            .values(**values, attempts=attempts, last_error=str(error), claim=None)
+            .execution_options(synchronize_session=False)
+        )
+
+    async def _send(self, reference_id: str, action: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply one change to the calendar service. Returns the calendar's response body."""
+        if action == "delete":
+            response = await self.calendar.delete(f"/api/events/by-reference/{reference_id}")
+            if response.status_code not in (200, 204, 404):
+                raise DeliveryError(f"{response.status_code} {response.text}")
+            return {}
+
+        response = await self.calendar.put(f"/api/events/by-reference/{reference_id}", json=payload)
+        if response.status_code == 404:
+            response = await self.calendar.post("/api/events/forum-topic", json=payload)
+        if response.status_code not in (200, 201):
+            raise DeliveryError(f"{response.status_code} {response.text}")
+        return response.json()
+
+    async def counts(self) -> Dict[str, int]:
+        """Number of outbox entries in each status."""
+        async with SessionLocal() as db:
+            rows = await db.execute(select(OutboxDB.status, func.count()).group_by(OutboxDB.status))
+            return {status: count for status, count in rows}
@@ -0,0 +1,127 @@
+"""Full-text search over forum topics and posts.
+
+On PostgreSQL, `topics` and `posts` get generated tsvector columns (topic
+titles weighted above descriptions) with GIN indexes, queried with
+websearch_to_tsquery and ranked with ts_rank. On SQLite the same text is
+mirrored into FTS5 tables kept in sync by triggers and ranked with bm25.
+Either way a search is an index lookup, and snippets are only highlighted
+for the page of results returned.
+"""
+import os
+from typing import Any, Dict, List
+
+from sqlalchemy import text
+
+# PostgreSQL text search configuration used to stem and index forum text
+SEARCH_LANGUAGE = os.getenv("SEARCH_LANGUAGE", "english")
+
+# Marks around matched words in snippets
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_STOP = "</mark>"
+
+_POSTGRES_DDL = [
+    """ALTER TABLE topics ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('{language}', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('{language}', coalesce(description, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_topics_search_vector ON topics USING GIN (search_vector)",
+    """ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        to_tsvector('{language}', coalesce(content, ''))
+    ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_posts_search_vector ON posts USING GIN (search_vector)",
+]
+
+# External-content FTS5 tables over the rows' rowids, kept in step with their tables by triggers
+_SQLITE_FTS_TABLES = {
+    "topics_fts": ("topics", ("title", "description")),
+    "posts_fts": ("posts", ("content",)),
+}
+
+_POSTGRES_SEARCH = """
+WITH query AS (SELECT websearch_to_tsquery('{language}', :q) AS q),
+matches AS (
+    SELECT 'topic' AS kind, t.id AS topic_id, NULL AS post_id, t.title, t.created_at,
+           t.title || ' ' || t.description AS body, ts_rank(t.search_vector, query.q) AS rank
+    FROM topics t, query WHERE t.search_vector @@ query.q
+    UNION ALL
+    SELECT 'post', p.topic_id, p.id, t.title, p.created_at,
+           p.content, ts_rank(p.search_vector, query.q)
+    FROM posts p JOIN topics t ON t.id = p.topic_id, query WHERE p.search_vector @@ query.q
+    ORDER BY rank DESC, created_at DESC
+    LIMIT :limit OFFSET :offset
+)
+SELECT kind, topic_id, post_id, title, created_at, rank,
+       ts_headline('{language}', body, query.q, :headline_options) AS snippet
+FROM matches, query
+ORDER BY rank DESC, created_at DESC
+"""
+
+_SQLITE_SEARCH = """
+SELECT 'topic' AS kind, t.id AS topic_id, NULL AS post_id, t.title, t.created_at,
+       -bm25(topics_fts, 10.0, 1.0) AS rank,
+       snippet(topics_fts, -1, :start, :stop, '...', 24) AS snippet
+FROM topics_fts JOIN topics t ON t.rowid = topics_fts.rowid
+WHERE topics_fts MATCH :q
+UNION ALL
+SELECT 'post', p.topic_id, p.id, t.title, p.created_at,
+       -bm25(posts_fts),
+       snippet(posts_fts, 0, :start, :stop, '...', 24)
+FROM posts_fts JOIN posts p ON p.rowid = posts_fts.rowid JOIN topics t ON t.id = p.topic_id
+WHERE posts_fts MATCH :q
+ORDER BY rank DESC, created_at DESC
+LIMIT :limit OFFSET :offset
+"""
+
+
+def _sqlite_fts_ddl(fts_table: str, table: str, columns) -> List[str]:
+    names = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    delete = f"INSERT INTO {fts_table}({fts_table}, rowid, {names}) VALUES ('delete', old.rowid, {old_values});"
+    insert = f"INSERT INTO {fts_table}(rowid, {names}) VALUES (new.rowid, {new_values});"
+    return [
+        f"CREATE VIRTUAL TABLE {fts_table} USING fts5({names}, content='{table}', content_rowid='rowid')",
+        f"CREATE TRIGGER {fts_table}_insert AFTER INSERT ON {table} BEGIN {insert} END",
+        f"CREATE TRIGGER {fts_table}_delete AFTER DELETE ON {table} BEGIN {delete} END",
+        f"CREATE TRIGGER {fts_table}_update AFTER UPDATE ON {table} BEGIN {delete} {insert} END",
+        # Index the rows written before search was set up
+        f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')",
+    ]
+
+
+async def create_search_indexes(conn) -> None:
+    """Add the search columns and indexes (or FTS tables) to an existing schema; safe to run on every start."""
+    if conn.dialect.name == "postgresql":
+        for statement in _POSTGRES_DDL:
+            await conn.execute(text(statement.format(language=SEARCH_LANGUAGE)))
+    elif conn.dialect.name == "sqlite":
+        existing = set((await conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))).scalars())
+        for fts_table, (table, columns) in _SQLITE_FTS_TABLES.items():
+            if fts_table not in existing:
+                for statement in _sqlite_fts_ddl(fts_table, table, columns):
+                    await conn.execute(text(statement))
+
+
+def fts5_query(q: str) -> str:
+    """Turn free text into an FTS5 query matching all of its words, so its operators can't be injected."""
+    return " ".join('"' + word.replace('"', '""') + '"' for word in q.split())
+
+
+async def search(db, q: str, limit: int, offset: int) -> List[Dict[str, Any]]:
+    """Topics and posts matching `q`, best match first, with highlighted snippets."""
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        statement = text(_POSTGRES_SEARCH.format(language=SEARCH_LANGUAGE))
+        params = {
+            "q": q,
+            "headline_options": f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, MaxFragments=2",
+        }
+    elif dialect == "sqlite":
+        statement = text(_SQLITE_SEARCH)
+        params = {"q": fts5_query(q), "start": HIGHLIGHT_START, "stop": HIGHLIGHT_STOP}
+        if not params["q"]:
+            return []
+    else:
+        raise NotImplementedError(f"Search is not supported on {dialect}")
+    rows = await db.execute(statement, {**params, "limit": limit, "offset": offset})
+    return [dict(row._mapping) for row in rows]
@@ -0,0 +1,100 @@
+import logging
+import os
+from typing import Dict, List
+
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Drop and recreate indexes whose definition differs from the expected one
+INDEX_AUTO_REPAIR = os.getenv("INDEX_AUTO_REPAIR", "false").lower() == "true"
+
+# Expected indexes per collection
+INDEXES: Dict[str, List[Dict]] = {
+    "bug_collection": [
+        {"name": "bug_id_unique", "keys": [("bug_id", 1)], "unique": True},
+        {"name": "employee_id_status", "keys": [("employee_id", 1), ("status", 1)], "unique": False},
+        {"name": "title_description_text", "keys": [("title", "text"), ("description", "text")], "unique": False,
+         "weights": {"title": 10, "description": 1}},
+        {"name": "due_at", "keys": [("due_at", 1)], "unique": False},
+        {"name": "search_tokens", "keys": [("search_tokens", 1)], "unique": False},
+    ],
+    "employee_collection": [
+        {"name": "employee_id_unique", "keys": [("employee_id", 1)], "unique": True},
+    ],
+    "client_collection": [
+        {"name": "client_id_unique", "keys": [("client_id", 1)], "unique": True},
+    ],
+    "calendar_outbox": [
+        {"name": "status_next_attempt_at", "keys": [("status", 1), ("next_attempt_at", 1)], "unique": False},
+        {"name": "claim", "keys": [("claim", 1)], "unique": False},
+    ],
+    "bug_signatures": [
+        {"name": "bug_id_unique", "keys": [("bug_id", 1)], "unique": True},
+    ],
+    "bug_events": [
+        {"name": "bug_id_start", "keys": [("bug_id", 1), ("start", 1)], "unique": False},
+        {"name": "end_start", "keys": [("end", 1), ("start", 1)], "unique": False},
+    ],
+    "bug_stats": [
+        {"name": "scope", "keys": [("scope", 1)], "unique": False},
+    ],
+}
+
+
+def _matches_spec(info: Dict, spec: Dict) -> bool:
+    """Check if an existing index has the keys and options of its expected definition."""
+    if bool(info.get("unique", False)) != spec["unique"]:
+        return False
+
+    text_fields = [field for field, direction in spec["keys"] if direction == "text"]
+    if text_fields:
+        # MongoDB reports text indexes as _fts/_ftsx keys, with the indexed fields in weights
+        weights = {field: spec.get("weights", {}).get(field, 1) for field in text_fields}
+        return ("_fts", "text") in [tuple(key) for key in info["key"]] and info.get("weights") == weights
+
+    keys = [(field, int(direction) if isinstance(direction, (int, float)) else direction)
+            for field, direction in info["key"]]
+    return keys == spec["keys"]
+
+
+async def ensure_indexes(db) -> Dict[str, Dict[str, List[str]]]:
+    """Create missing indexes and report drift from the expected definitions.
+
+    Returns, per collection, the indexes that were created, drifted (same name,
+    different definition) or unexpected (present but not declared in INDEXES).
+    """
+    report = {}
+    for collection_name, specs in INDEXES.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        result = {"created": [], "drifted": [], "unexpected": []}
+
+        for spec in specs:
+            info = existing.get(spec["name"])
+            if info is not None and _matches_spec(info, spec):
+                continue
+
+            if info is not None:
+                result["drifted"].append(spec["name"])
+                logger.warning(f"Index {collection_name}.{spec['name']} drifted: {info['key']} != {spec['keys']}")
+                if not INDEX_AUTO_REPAIR:
+                    continue
+                await collection.drop_index(spec["name"])
+
+            try:
+                options = {"weights": spec["weights"]} if "weights" in spec else {}
+                await collection.create_index(spec["keys"], name=spec["name"], unique=spec["unique"], **options)
+                result["created"].append(spec["name"])
+                logger.info(f"Created index {collection_name}.{spec['name']}")
+            except OperationFailure as e:
+                # Usually duplicate values blocking a unique index; the service still works without it
+                logger.error(f"Failed to create index {collection_name}.{spec['name']}: {e}")
+
+        declared = {spec["name"] for spec in specs} | {"_id_"}
+        result["unexpected"] = [name for name in existing if name not in declared]
+        for name in result["unexpected"]:
+            logger.warning(f"Unexpected index {collection_name}.{name}")
+
+        report[collection_name] = result
+    return report
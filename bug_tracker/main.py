@@ -1,32 +1,80 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
-from pymongo import MongoClient
-from typing import Optional
-from bson import ObjectId
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from typing import List, Optional
 import uvicorn
 import os
-import requests
+import asyncio
+from urllib.parse import quote
 from datetime import datetime, timedelta
+from pymongo.errors import DuplicateKeyError
+from database import get_database, transaction
+from repository import BugRepository, EmployeeRepository, ClientRepository
+from indexes import ensure_indexes
+from pagination import (PageRequest, page_request, paginate, created_range_filter, MAX_PAGE_SIZE,
+                        decode_offset_cursor, encode_offset_cursor, stream_json_array)
+from outbox import CalendarOutbox
+from bulk_import import parse_records, import_records
+from bug_status import BugStatus, counter_deltas, merge_deltas
+from stats import BugStats, SCOPES, BUG_DEADLINE_DAYS, stats_deltas, summarize
+from search import SearchQuery, search_backend, search_tokens, TOKENS_FIELD
+from duplicates import DuplicateIndex, signature
+from events import BugEventLog, change_events, replay
+from deadlines import DeadlineScheduler, default_due_at, utc_naive
+from cache import ResponseCache, get_cache_backend, bug_list_tags, bug_change_tags
+from realtime import BugEventBroker, bug_message, HEARTBEAT, LAGGED
+from attachments import BugAttachments, blob_store
+import service_client
 
 app = FastAPI()
 
 # MongoDB setup
-mongodb_url = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
-client = MongoClient(mongodb_url)
-db = client["bugtracker_db"]  # Use a specific DB
+db = get_database()
 
 # Service URLs
 CALENDAR_SERVICE_URL = os.getenv("CALENDAR_SERVICE_URL", "http://localhost:5000")
 FORUM_SERVICE_URL = os.getenv("FORUM_SERVICE_URL", "http://localhost:8004")
 
+# Pooled, circuit-broken clients for the services we call
+forum_service = service_client.service("forum", FORUM_SERVICE_URL)
+
 employee_collection = db["employee_collection"]
 bug_collection = db["bug_collection"]
 manager_collection = db["manager_collection"]
 client_collection = db["client_collection"]
 
+bugs = BugRepository(bug_collection)
+employees = EmployeeRepository(employee_collection)
+clients = ClientRepository(client_collection)
+
+# Calendar changes are queued here and delivered in the background
+calendar_outbox = CalendarOutbox(db["calendar_outbox"], CALENDAR_SERVICE_URL)
+
+# Open/closed/overdue counts per employee and client, kept up to date by bug writes
+bug_stats = BugStats(db["bug_stats"])
+
+# Append-only history of bug changes
+event_log = BugEventLog(db["bug_events"])
+
+# Full-text search over bug titles and descriptions
+bug_search = search_backend(bug_collection)
+
+# MinHash/LSH signatures for spotting near-duplicate bug reports
+duplicate_index = DuplicateIndex(db["bug_signatures"])
+
+# Cached bug and employee lists, invalidated by the writes that change them
+list_cache = ResponseCache(get_cache_backend())
+
+# Pushes bug changes to dashboards subscribed to this process
+bug_broker = BugEventBroker()
+
+# Files attached to bugs, stored outside the bug documents
+attachments = BugAttachments(bug_collection, blob_store(db))
+
 # Helper to serialize ObjectId
 def serialize_doc(doc):
     doc["_id"] = str(doc["_id"])
+    doc.pop(TOKENS_FIELD, None)
     return doc
 
 # Pydantic models
@@ -37,10 +85,25 @@ class Employee(BaseModel):
     bugs_pending: int = 0
 
 class Bug(BaseModel):
+    model_config = ConfigDict(use_enum_values=True)
+
     bug_id: str
     title: str
     description: str
-    status: str = "Pending"
+    status: BugStatus = BugStatus.PENDING
+    client_id: Optional[str] = None
+    due_at: datetime = Field(default_factory=default_due_at)
+
+    @field_validator("due_at")
+    @classmethod
+    def store_due_at_as_utc(cls, value):
+        return utc_naive(value)
+
+def bug_document(bug: Bug):
+    """Build the stored document for a new bug, with the words prefix searches look up"""
+    document = bug.model_dump()
+    document[TOKENS_FIELD] = search_tokens(document)
+    return document
 
 class Manager(BaseModel):
     manager_id: str
@@ -50,6 +113,91 @@ class Client(BaseModel):
     client_id: str
     name: str
 
+class BulkAssignment(BaseModel):
+    employee_id: str
+    bug_ids: Optional[List[str]] = None
+    status: Optional[str] = None
+    current_employee_id: Optional[str] = None
+    assigned_by: Optional[str] = None
+    unassigned_only: bool = False
+    created_after: Optional[datetime] = None
+    created_before: Optional[datetime] = None
+
+@app.on_event("startup")
+async def bootstrap_indexes():
+    await ensure_indexes(db)
+
+@app.on_event("startup")
+async def load_search_index():
+    await bug_search.load()
+
+@app.on_event("startup")
+async def load_duplicate_index():
+    await duplicate_index.load(bug_collection)
+
+@app.on_event("startup")
+async def start_outbox_dispatcher():
+    app.state.outbox_task = asyncio.create_task(calendar_outbox.run())
+
+@app.on_event("startup")
+async def start_deadline_scheduler():
+    await deadline_scheduler.backfill()
+    app.state.deadline_task = asyncio.create_task(deadline_scheduler.run())
+
+@app.on_event("shutdown")
+async def stop_outbox_dispatcher():
+    app.state.outbox_task.cancel()
+
+@app.on_event("shutdown")
+async def stop_deadline_scheduler():
+    app.state.deadline_task.cancel()
+
+@app.on_event("shutdown")
+async def close_service_clients():
+    await service_client.close_all()
+
+async def record_bug_changes(changes, session=None, by=None):
+    """Update employee counters and bug stats and log events for (before, after) bug states.
+
+    Returns the cache tags to invalidate and the messages for subscribers,
+    to pass to announce_bug_changes once the changes are committed.
+    """
+    counters, stat_changes, events, stale, messages = {}, {}, [], set(), []
+    for before, after in changes:
+        merge_deltas(counters, counter_deltas(before, after))
+        merge_deltas(stat_changes, stats_deltas(before, after))
+        for event in change_events(before, after, by):
+            events.append((after["bug_id"], event))
+            messages.append(bug_message(after["bug_id"], event, after))
+        stale.update(bug_change_tags(before, after))
+    await employees.apply_counter_deltas(counters, session=session)
+    await bug_stats.apply(stat_changes, session=session)
+    await event_log.append(events, session=session)
+    if counters:
+        stale.add("employees")
+    return stale, messages
+
+async def announce_bug_changes(stale, messages):
+    """Invalidate cached lists and notify subscribers of committed bug changes"""
+    await list_cache.invalidate(stale)
+    bug_broker.publish(messages)
+
+async def on_bugs_overdue(overdue):
+    """Count, log and notify bugs the deadline scheduler has just marked overdue"""
+    stat_changes = {}
+    for bug in overdue:
+        merge_deltas(stat_changes, stats_deltas({**bug, "overdue_at": None}, bug))
+    await bug_stats.apply(stat_changes)
+    events = [(bug, {"t": bug["overdue_at"], "k": "overdue"}) for bug in overdue]
+    await event_log.append([(bug["bug_id"], event) for bug, event in events])
+    await announce_bug_changes([tag for bug in overdue for tag in bug_change_tags(bug, bug)],
+                               [bug_message(bug["bug_id"], event, bug) for bug, event in events])
+    # Raise the calendar event's priority so the missed deadline stands out
+    await calendar_outbox.enqueue_many([(bug["bug_id"], "update", {"priority": "high"}) for bug in overdue])
+    calendar_outbox.notify()
+
+deadline_scheduler = DeadlineScheduler(bug_collection, on_bugs_overdue)
+
 # Routes
 
 @app.get("/")
@@ -58,131 +206,337 @@ async def root():
 
 # --------------------- CLIENT ---------------------
 
-async def create_calendar_event_for_bug(bug: Bug):
-    """Create a calendar event for a new bug"""
-    event_data = {
-        "title": f"Bug: {bug.title}",
-        "start": datetime.now().isoformat(),
-        "end": (datetime.now() + timedelta(days=7)).isoformat(),  # Default 7-day deadline
-        "desc": bug.description,
+def calendar_event_for_bug(bug):
+    """Build the calendar event for a new bug document"""
+    return {
+        "title": f"Bug: {bug['title']}",
+        "start": datetime.utcnow().isoformat() + "Z",
+        "end": bug["due_at"].isoformat() + "Z",
+        "desc": bug["description"],
         "allDay": False,
         "createdBy": "bug_tracker",
         "eventType": "bug",
-        "referenceId": bug.bug_id,
-        "status": bug.status
+        "referenceId": bug["bug_id"],
+        "status": bug["status"]
     }
 
-    try:
-        response = requests.post(f"{CALENDAR_SERVICE_URL}/api/events", json=event_data)
-        if response.status_code == 200:
-            print(f"Calendar event created for bug {bug.bug_id}")
-        else:
-            print(f"Failed to create calendar event: {response.text}")
-    except Exception as e:
-        print(f"Error creating calendar event: {str(e)}")
+async def create_calendar_event_for_bug(bug, session=None):
+    """Queue a calendar event for a new bug document"""
+    await calendar_outbox.enqueue(bug["bug_id"], "create", calendar_event_for_bug(bug), session=session)
+
+async def on_bugs_imported(new_bugs):
+    """Record a batch of imported bug documents and queue their calendar events"""
+    await announce_bug_changes(*await record_bug_changes([(None, bug) for bug in new_bugs]))
+    bug_search.add(new_bugs)
+    await duplicate_index.add(new_bugs)
+    await calendar_outbox.enqueue_many([(bug["bug_id"], "create", calendar_event_for_bug(bug)) for bug in new_bugs])
+    for bug in new_bugs:
+        deadline_scheduler.schedule(bug["bug_id"], bug["due_at"])
+
+async def describe_duplicates(matches):
+    """Look up the bugs behind (bug_id, similarity) matches"""
+    found = {doc["bug_id"]: doc async for doc in bug_collection.find(
+        {"bug_id": {"$in": [bug_id for bug_id, _ in matches]}}, {"_id": 0, "bug_id": 1, "title": 1, "status": 1}
+    )}
+    return [{**found[bug_id], "similarity": round(score, 3)} for bug_id, score in matches if bug_id in found]
 
 @app.post("/client/bugs/create")
-async def create_bug(bug: Bug):
-    bug_collection.insert_one(bug.model_dump())
-    if bug_collection.find_one({"bug_id": bug.bug_id}):
-        # Create calendar event for the new bug
-        await create_calendar_event_for_bug(bug)
-        return {"message": "Bug created successfully"}
-    return {"message": "Bug creation failed"}
+async def create_bug(bug: Bug, link_duplicates: bool = False):
+    document = bug_document(bug)
+    # MinHash runs in a worker thread so long descriptions don't hold up other requests
+    sig = await asyncio.to_thread(signature, document)
+    matches = duplicate_index.find(sig, exclude=bug.bug_id)
+    if link_duplicates and matches:
+        document["duplicate_of"] = [bug_id for bug_id, _ in matches]
+    try:
+        async with transaction(db) as session:
+            await bugs.insert(document, session=session)
+            stale, messages = await record_bug_changes([(None, document)], session=session)
+            await duplicate_index.save([(bug.bug_id, sig)], session=session)
+            # Create calendar event for the new bug
+            await create_calendar_event_for_bug(document, session=session)
+    except DuplicateKeyError:
+        return {"message": "Bug already exists"}
+    await announce_bug_changes(stale, messages)
+    bug_search.add([document])
+    deadline_scheduler.schedule(bug.bug_id, document["due_at"])
+    calendar_outbox.notify()
+    return {"message": "Bug created successfully", "possible_duplicates": await describe_duplicates(matches)}
+
+@app.post("/client/bugs/import")
+async def import_bugs(request: Request, format: Optional[str] = None):
+    """Import bugs from an NDJSON or CSV request body, skipping ids that already exist"""
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    if fmt not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail=f"Unsupported import format '{fmt}'")
+
+    # Records are parsed as the body arrives, so large imports are never held in memory or block the loop
+    report = await import_records(parse_records(request.stream(), fmt), Bug, "bug_id", bug_collection,
+                                  on_bugs_imported, bug_document)
+
+    calendar_outbox.notify()
+    return report.as_dict()
 
 # --------------------- MANAGER ---------------------
 
 @app.post("/manager/client/create")
 async def create_client(client_data: Client):
-    if client_collection.find_one({"client_id": client_data.client_id}):
+    if await clients.exists(client_data.client_id):
         return {"message": "Client already exists"}
-    client_collection.insert_one(client_data.model_dump())
-    if client_collection.find_one({"client_id": client_data.client_id}):
+    if not await clients.create(client_data.model_dump()):
+        return {"message": "Client already exists"}
+    if await clients.exists(client_data.client_id):
         return {"message": "Client created successfully"}
     return {"message": "Client creation failed"}
 
 @app.post("/manager/employee/create")
 async def create_employee(employee: Employee):
-    if employee_collection.find_one({"employee_id": employee.employee_id}):
+    if await employees.exists(employee.employee_id):
+        return {"message": "Employee already exists"}
+    if not await employees.create(employee.model_dump()):
         return {"message": "Employee already exists"}
-    employee_collection.insert_one(employee.model_dump())
+    await list_cache.invalidate(["employees"])
     return {"message": "Employee created successfully"}
 
 @app.get("/manager/employees")
-async def list_employees():
-    return [serialize_doc(emp) for emp in employee_collection.find()]
+async def list_employees(request: Request, page: PageRequest = Depends(page_request)):
+    return await list_cache.respond(request, ["employees"], lambda: paginate(
+        employees.collection, {}, page, employees.sort_fields, serialize_doc))
 
 
 @app.get("/manager/clients")
-async def list_clients():
-    return [serialize_doc(client) for client in client_collection.find()]
+async def list_clients(page: PageRequest = Depends(page_request)):
+    return await paginate(clients.collection, {}, page, clients.sort_fields, serialize_doc)
 
 @app.post("/manager/bugs/assign")
-async def assign_bug(bug_id: str, employee_id: str):
-    if bug_collection.find_one({"bug_id": bug_id}):
-        bug_collection.update_one(
-            {"bug_id": bug_id},
-            {"$set": {"employee_id": employee_id}}
-        )
-        employee_collection.update_one(
-            {"employee_id": employee_id},
-            {"$inc": {"bugs_pending": 1}}
-        )
+async def assign_bug(bug_id: str, employee_id: str, assigned_by: Optional[str] = None):
+    async with transaction(db) as session:
+        previous = await bugs.assign(bug_id, employee_id, session=session)
+        if previous:
+            stale, messages = await record_bug_changes([(previous, {**previous, "employee_id": employee_id})],
+                                                       session=session, by=assigned_by)
+    if previous:
+        await announce_bug_changes(stale, messages)
         return {"message": "Bug assigned successfully"}
     return {"message": "Bug assignment failed"}
 
+@app.post("/manager/bugs/assign/bulk")
+async def assign_bugs(assignment: BulkAssignment):
+    """Assign every bug matching a filter to an employee"""
+    query = bug_filter(assignment.status, assignment.current_employee_id,
+                       assignment.created_after, assignment.created_before)
+    if assignment.bug_ids is not None:
+        query["bug_id"] = {"$in": assignment.bug_ids}
+    if assignment.unassigned_only:
+        if assignment.current_employee_id:
+            raise HTTPException(status_code=400, detail="Cannot combine unassigned_only with current_employee_id")
+        query["employee_id"] = {"$exists": False}
+    if not query:
+        raise HTTPException(status_code=400, detail="At least one filter is required")
+
+    stale, messages = set(), []
+
+    async with transaction(db) as session:
+        async def on_assigned(changes):
+            batch_stale, batch_messages = await record_bug_changes(changes, session=session, by=assignment.assigned_by)
+            stale.update(batch_stale)
+            messages.extend(batch_messages)
+
+        assigned = await bugs.assign_many(query, assignment.employee_id, on_assigned, session=session)
+    await announce_bug_changes(stale, messages)
+    return {"message": f"{assigned} bugs assigned successfully", "assigned": assigned}
+
+
+def bug_filter(status: Optional[str] = None, employee_id: Optional[str] = None,
+               created_after: Optional[datetime] = None, created_before: Optional[datetime] = None,
+               overdue: Optional[bool] = None):
+    query = created_range_filter(created_after, created_before)
+    if status:
+        query["status"] = status
+    if employee_id:
+        query["employee_id"] = employee_id
+    if overdue is not None:
+        query["overdue_at"] = {"$exists": overdue}
+    return query
+
+@app.get("/manager/stats")
+async def get_stats(scope: str = "all", scope_id: Optional[str] = None, page: PageRequest = Depends(page_request)):
+    """Open, closed and overdue bug counts overall, for one employee/client, or for every employee/client"""
+    if scope not in SCOPES:
+        raise HTTPException(status_code=400, detail=f"Unknown stats scope '{scope}'")
+    if scope == "all" or scope_id:
+        return await bug_stats.get(scope, scope_id or "all")
+    return await paginate(bug_stats.collection, {"scope": scope}, page, (), summarize)
+
+@app.post("/manager/stats/rebuild")
+async def rebuild_stats():
+    """Recompute bug stats from the bug collection"""
+    count = await bug_stats.rebuild(bug_collection)
+    return {"message": f"Rebuilt stats for {count} scopes"}
+
+@app.get("/manager/bugs/search")
+async def search_bugs(
+    q: str,
+    status: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    """Search bug titles and descriptions, best matches first.
+
+    `q` takes words, "quoted phrases" and prefix* terms. The next page's cursor
+    is returned in the X-Next-Cursor header.
+    """
+    offset = decode_offset_cursor(cursor)
+    results = await bug_search.search(SearchQuery(q), bug_filter(status, employee_id), offset, limit + 1)
+    headers = {}
+    if len(results) > limit:
+        results = results[:limit]
+        headers["X-Next-Cursor"] = encode_offset_cursor(offset + limit)
+    return StreamingResponse(stream_json_array(results, serialize_doc), media_type="application/json", headers=headers)
+
+@app.get("/manager/bugs/{bug_id}/duplicates")
+async def find_duplicate_bugs(bug_id: str):
+    """List bugs that are likely duplicates of an existing bug, most similar first"""
+    sig = duplicate_index.signatures.get(bug_id)
+    if sig is None:
+        bug = await bugs.get(bug_id)
+        if not bug:
+            return {"message": "Bug not found"}
+        sig = await asyncio.to_thread(signature, bug)
+    return await describe_duplicates(duplicate_index.find(sig, exclude=bug_id))
+
+@app.get("/manager/bugs/{bug_id}/history")
+async def get_bug_history(bug_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """List a bug's changes in [since, until), oldest first"""
+    return await event_log.history(bug_id, since, until)
+
+@app.get("/manager/bugs/{bug_id}/replay")
+async def replay_bug(bug_id: str, until: Optional[datetime] = None):
+    """Rebuild a bug's state from its history, as it was just before `until` (or now)"""
+    events = await event_log.history(bug_id, until=until)
+    if not events:
+        return {"message": "Bug not found"}
+    return {"bug_id": bug_id, **replay(events)}
+
+@app.get("/manager/events")
+async def list_bug_events(since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """Stream the changes to all bugs in [since, until)"""
+    return StreamingResponse(stream_json_array(event_log.events(since, until),
+                                               lambda event: {**event, "t": event["t"].isoformat()}),
+                             media_type="application/json")
+
+@app.get("/manager/reports/cycle-time")
+async def cycle_time_report(since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """Time from creation to completion of the bugs completed in [since, until)"""
+    return await event_log.cycle_time_report(since, until, bug_collection, timedelta(days=BUG_DEADLINE_DAYS))
 
 @app.get("/manager/bugs")
-async def list_bugs():
-    return [serialize_doc(bug) for bug in bug_collection.find()]
+async def list_bugs(
+    request: Request,
+    status: Optional[str] = None,
+    employee_id: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    overdue: Optional[bool] = None,
+    page: PageRequest = Depends(page_request)
+):
+    query = bug_filter(status, employee_id, created_after, created_before, overdue)
+    return await list_cache.respond(request, bug_list_tags(status, employee_id), lambda: paginate(
+        bugs.collection, query, page, bugs.sort_fields, serialize_doc))
 
 # --------------------- EMPLOYEE ---------------------
 
 @app.get("/employee/{employee_id}/bugs")
-async def list_employee_bugs(employee_id: str):
-    return [serialize_doc(bug) for bug in bug_collection.find({"employee_id": employee_id})]
+async def list_employee_bugs(
+    request: Request,
+    employee_id: str,
+    status: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    page: PageRequest = Depends(page_request)
+):
+    query = bug_filter(status, employee_id, created_after, created_before)
+    return await list_cache.respond(request, bug_list_tags(status, employee_id), lambda: paginate(
+        bugs.collection, query, page, bugs.sort_fields, serialize_doc))
 
 @app.get("/employee/{employee_id}/bugs/completed")
-async def list_completed_bugs(employee_id: str):
-    return [serialize_doc(bug) for bug in bug_collection.find({"employee_id": employee_id, "status": "Completed"})]
+async def list_completed_bugs(request: Request, employee_id: str, page: PageRequest = Depends(page_request)):
+    return await list_cache.respond(request, bug_list_tags("Completed", employee_id), lambda: paginate(
+        bugs.collection, bug_filter("Completed", employee_id), page, bugs.sort_fields, serialize_doc))
 
 @app.get("/employee/{employee_id}/bugs/pending")
-async def list_pending_bugs(employee_id: str):
-    return [serialize_doc(bug) for bug in bug_collection.find({"employee_id": employee_id, "status": "Pending"})]
+async def list_pending_bugs(request: Request, employee_id: str, page: PageRequest = Depends(page_request)):
+    return await list_cache.respond(request, bug_list_tags("Pending", employee_id), lambda: paginate(
+        bugs.collection, bug_filter("Pending", employee_id), page, bugs.sort_fields, serialize_doc))
 
 @app.post("/employee/{employee_id}/bugs/update")
-async def update_bug_status(employee_id: str, bug_id: str, status: str):
-    bug = bug_collection.find_one({"bug_id": bug_id})
+async def update_bug_status(employee_id: str, bug_id: str, status: BugStatus):
+    async with transaction(db) as session:
+        previous = await bugs.transition(bug_id, employee_id, status, session=session)
+        if previous and previous["status"] != status.value:
+            stale, messages = await record_bug_changes([(previous, {**previous, "status": status.value})],
+                                                       session=session, by=employee_id)
+            # Update calendar event status
+            await calendar_outbox.enqueue(bug_id, "update", {"status": status.value}, session=session)
+
+    if previous is None:
+        # Work out why the transition was refused; this only runs on the failure path
+        bug = await bugs.get(bug_id)
+        if not bug:
+            return {"message": "Bug not found"}
+        if bug.get("employee_id") != employee_id:
+            raise HTTPException(status_code=403, detail=f"Bug {bug_id} is not assigned to employee {employee_id}")
+        raise HTTPException(status_code=409, detail=f"Cannot change bug {bug_id} from {bug['status']} to {status.value}")
+
+    if previous["status"] != status.value:
+        await announce_bug_changes(stale, messages)
+    if previous["status"] == BugStatus.COMPLETED.value and previous.get("due_at"):
+        # Reopened: its deadline may need firing again
+        deadline_scheduler.schedule(bug_id, previous["due_at"])
+    calendar_outbox.notify()
+    return {"message": f"Bug {bug_id} updated to status {status.value}"}
+
+# --------------------- ATTACHMENTS ---------------------
+
+@app.post("/bugs/{bug_id}/attachments")
+async def upload_attachment(bug_id: str, request: Request, filename: Optional[str] = None):
+    """Attach the raw request body to a bug as a file, streaming it into storage"""
+    attachment, bug = await attachments.add(bug_id, request.stream(), filename, request.headers.get("content-type"))
+    await list_cache.invalidate(bug_change_tags(bug, bug))
+    return {"message": "Attachment uploaded successfully", "attachment": attachment}
+
+@app.get("/bugs/{bug_id}/attachments")
+async def list_attachments(bug_id: str):
+    bug = await bugs.get(bug_id)
+    if not bug:
+        raise HTTPException(status_code=404, detail=f"Bug {bug_id} not found")
+    return bug.get("attachments", [])
+
+@app.get("/bugs/{bug_id}/attachments/{attachment_id}")
+async def download_attachment(bug_id: str, attachment_id: str):
+    """Stream an attachment's contents"""
+    attachment, chunks = await attachments.open(bug_id, attachment_id)
+    headers = {
+        "Content-Length": str(attachment["size"]),
+        "Content-Disposition": f"attachment; filename*=UTF-8''{quote(attachment['filename'])}",
+        "ETag": f'"{attachment["sha256"]}"',
+    }
+    return StreamingResponse(chunks, media_type=attachment["content_type"], headers=headers)
+
+@app.delete("/bugs/{bug_id}/attachments/{attachment_id}")
+async def delete_attachment(bug_id: str, attachment_id: str):
+    bug = await attachments.remove(bug_id, attachment_id)
     if bug:
-        bug_collection.update_one(
-            {"bug_id": bug_id, "employee_id": employee_id},
-            {"$set": {"status": status}}
-        )
-        employee_collection.update_one(
-            {"employee_id": employee_id},
-            {"$inc": {"bugs_completed": 1}}
-        )
-
-        # Update calendar event status
-        try:
-            response = requests.put(
-                f"{CALENDAR_SERVICE_URL}/api/events/by-reference/{bug_id}",
-                json={"status": status}
-            )
-            if response.status_code != 200:
-                print(f"Failed to update calendar event status: {response.text}")
-        except Exception as e:
-            print(f"Error updating calendar event status: {str(e)}")
-
-        return {"message": f"Bug {bug_id} updated to status {status}"}
-    return {"message": "Bug not found"}
+        await list_cache.invalidate(bug_change_tags(bug, bug))
+    return {"message": "Attachment deleted successfully"}
 
 # --------------------- FORUM INTEGRATION ---------------------
 
 @app.post("/bugs/{bug_id}/create-forum-topic")
 async def create_forum_topic_for_bug(bug_id: str, title: str, description: str):
     """Create a forum topic for discussion about a specific bug"""
-    bug = bug_collection.find_one({"bug_id": bug_id})
+    bug = await bugs.get(bug_id)
     if not bug:
         return {"message": "Bug not found"}
 
@@ -195,7 +549,7 @@ async def create_forum_topic_for_bug(bug_id: str, title: str, description: str):
         }
 
         # Send request to forum service
-        response = requests.post(f"{FORUM_SERVICE_URL}/topics/", json=topic_data)
+        response = await forum_service.post("/topics/", json=topic_data)
 
         if response.status_code == 200:
             return {"message": "Forum topic created successfully", "topic": response.json()}
@@ -204,6 +558,62 @@ async def create_forum_topic_for_bug(bug_id: str, title: str, description: str):
     except Exception as e:
         return {"message": f"Error creating forum topic: {str(e)}"}
 
+# --------------------- REALTIME ---------------------
+
+async def sse_stream(subscriber):
+    """Format a subscriber's bug messages as server-sent events"""
+    async for data in bug_broker.listen(subscriber):
+        if data is HEARTBEAT:
+            yield b": keep-alive\n\n"
+        elif data == LAGGED:
+            yield b"event: lagged\ndata: {}\n\n"
+        else:
+            yield b"data: " + data + b"\n\n"
+
+@app.get("/manager/bugs/subscribe")
+async def subscribe_bug_updates(employee_id: Optional[str] = None, client_id: Optional[str] = None):
+    """Stream bug changes, optionally for one employee and/or client, as server-sent events"""
+    return StreamingResponse(sse_stream(bug_broker.subscribe(employee_id, client_id)),
+                             media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/employee/{employee_id}/bugs/subscribe")
+async def subscribe_employee_bug_updates(employee_id: str):
+    """Stream changes to an employee's bugs as server-sent events"""
+    return StreamingResponse(sse_stream(bug_broker.subscribe(employee_id)),
+                             media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.websocket("/manager/bugs/ws")
+async def bug_updates_socket(websocket: WebSocket, employee_id: Optional[str] = None, client_id: Optional[str] = None):
+    """Push bug changes, optionally for one employee and/or client, over a WebSocket"""
+    await websocket.accept()
+    try:
+        async for data in bug_broker.listen(bug_broker.subscribe(employee_id, client_id)):
+            if data is HEARTBEAT:
+                await websocket.send_text('{"k": "ping"}')
+            elif data == LAGGED:
+                await websocket.close(code=1013, reason="lagged")
+            else:
+                await websocket.send_text(data.decode("utf-8"))
+    except WebSocketDisconnect:
+        pass
+
+# --------------------- METRICS ---------------------
+
+@app.get("/metrics/services")
+async def service_metrics():
+    """Latency, error and circuit state of calls to other services"""
+    return service_client.metrics()
+
+@app.get("/metrics/cache")
+async def cache_metrics():
+    """Hits, misses and 304 responses of the list cache"""
+    return list_cache.snapshot()
+
+@app.get("/metrics/realtime")
+async def realtime_metrics():
+    """Bug update subscribers connected to this process"""
+    return {"subscribers": bug_broker.count()}
+
 # --------------------- MAIN ---------------------
 
 if __name__ == "__main__":
@@ -0,0 +1,438 @@
+"""In-memory stand-in for the subset of the Motor API used by the bug tracker.
+
+Selected with ``MONGODB_URL=memory://`` so the service and its tests can run
+without a MongoDB server. Results use pymongo's own result types. Operations
+never yield to the event loop, so each one (and any sequence of them without
+other awaits in between) is atomic; ``session`` arguments are accepted and
+ignored. Each operation is counted under the MongoDB command it stands for
+(``InMemoryDatabase.commands``) so round trips can be measured.
+"""
+import copy
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+_MISSING = object()
+
+
+def _get_path(doc: Dict, path: str) -> Any:
+    """Get a (possibly dotted) field from a document, or _MISSING."""
+    value = doc
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+
+def _set_path(doc: Dict, path: str, value: Any) -> None:
+    """Set a (possibly dotted) field on a document, creating parents as needed."""
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset_path(doc: Dict, path: str) -> None:
+    """Remove a (possibly dotted) field from a document if present."""
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def _compare(value: Any, op: str, arg: Any) -> bool:
+    """Evaluate a single query operator against a field value."""
+    if op == "$exists":
+        return (value is not _MISSING) == bool(arg)
+    if value is _MISSING:
+        value = None
+    if op == "$eq":
+        return _equals(value, arg)
+    if op == "$ne":
+        return not _equals(value, arg)
+    if op == "$in":
+        return any(_equals(value, item) for item in arg)
+    if op == "$nin":
+        return not any(_equals(value, item) for item in arg)
+    try:
+        if op == "$gt":
+            return value is not None and value > arg
+        if op == "$gte":
+            return value is not None and value >= arg
+        if op == "$lt":
+            return value is not None and value < arg
+        if op == "$lte":
+            return value is not None and value <= arg
+    except TypeError:
+        return False
+    raise ValueError(f"Unsupported query operator '{op}'")
+
+
+def _equals(value: Any, arg: Any) -> bool:
+    """Match a field against a value, including membership in array fields."""
+    if isinstance(value, list) and not isinstance(arg, list):
+        return arg in value
+    return value == arg
+
+
+def matches(doc: Dict, query: Optional[Dict]) -> bool:
+    """Check if a document matches a MongoDB-style query."""
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+            value = _get_path(doc, key)
+            if not all(_compare(value, op, arg) for op, arg in condition.items()):
+                return False
+        elif not _compare(_get_path(doc, key), "$eq", condition):
+            return False
+    return True
+
+
+def apply_update(doc: Dict, update: Dict, is_insert: bool = False) -> None:
+    """Apply MongoDB-style update operators to a document in place."""
+    for op, fields in update.items():
+        for path, arg in fields.items():
+            if op == "$set":
+                _set_path(doc, path, copy.deepcopy(arg))
+            elif op == "$setOnInsert":
+                if is_insert:
+                    _set_path(doc, path, copy.deepcopy(arg))
+            elif op == "$unset":
+                _unset_path(doc, path)
+            elif op == "$inc":
+                current = _get_path(doc, path)
+                _set_path(doc, path, (0 if current is _MISSING else current) + arg)
+            elif op in ("$min", "$max"):
+                current = _get_path(doc, path)
+                if current is _MISSING or (arg < current if op == "$min" else arg > current):
+                    _set_path(doc, path, copy.deepcopy(arg))
+            elif op == "$push":
+                current = _get_path(doc, path)
+                items = [] if current is _MISSING else current
+                if isinstance(arg, dict) and "$each" in arg:
+                    items.extend(copy.deepcopy(arg["$each"]))
+                else:
+                    items.append(copy.deepcopy(arg))
+                _set_path(doc, path, items)
+            elif op == "$pull":
+                current = _get_path(doc, path)
+                if isinstance(current, list):
+                    _set_path(doc, path, [item for item in current if not (
+                        matches(item, arg) if isinstance(arg, dict) else _equals(item, arg))])
+            else:
+                raise ValueError(f"Unsupported update operator '{op}'")
+
+
+def _project(doc: Dict, projection: Optional[Dict]) -> Dict:
+    """Apply an inclusion or exclusion projection to a document."""
+    if not projection:
+        return doc
+    include_id = projection.get("_id", 1)
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if fields and all(fields.values()):
+        result = {k: doc[k] for k in fields if k in doc}
+    else:
+        result = {k: v for k, v in doc.items() if fields.get(k, 1)}
+    if include_id and "_id" in doc:
+        result["_id"] = doc["_id"]
+    elif not include_id:
+        result.pop("_id", None)
+    return result
+
+
+def _index_key(doc: Dict, keys: List[Tuple[str, int]]) -> Tuple:
+    """Build the unique-index key of a document; missing fields index as null."""
+    return tuple(None if (value := _get_path(doc, field)) is _MISSING else value for field, _ in keys)
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    """Sort missing and null values first, like MongoDB."""
+    if value is _MISSING or value is None:
+        return (0, 0)
+    return (1, value)
+
+
+class InMemoryCursor:
+    """Async cursor over a snapshot of matching documents."""
+
+    def __init__(self, docs: List[Dict], projection: Optional[Dict] = None):
+        self._docs = docs
+        self._projection = projection
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list, direction: int = 1) -> "InMemoryCursor":
+        keys = key_or_list if isinstance(key_or_list, list) else [(key_or_list, direction)]
+        for key, key_direction in reversed(keys):
+            self._docs.sort(key=lambda d: _sort_key(_get_path(d, key)), reverse=key_direction < 0)
+        return self
+
+    def skip(self, count: int) -> "InMemoryCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "InMemoryCursor":
+        self._limit = count
+        return self
+
+    def _results(self) -> List[Dict]:
+        docs = self._docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [_project(copy.deepcopy(d), self._projection) for d in docs]
+
+    def __aiter__(self):
+        self._iter = iter(self._results())
+        return self
+
+    async def __anext__(self) -> Dict:
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict]:
+        results = self._results()
+        return results if length is None else results[:length]
+
+
+class InMemoryCollection:
+    """Async collection storing documents in insertion order."""
+
+    def __init__(self, name: str, commands: Optional[Counter] = None):
+        self.name = name
+        self.commands = commands if commands is not None else Counter()
+        self._docs: Dict[Any, Dict] = {}
+        self._indexes: Dict[str, Dict] = {"_id_": {"key": [("_id", 1)], "unique": True}}
+
+    def _unique_indexes(self):
+        return [(name, index) for name, index in self._indexes.items() if "entries" in index]
+
+    def _check_unique(self, doc: Dict, ignore_id: Any = None) -> None:
+        for name, index in self._unique_indexes():
+            owner = index["entries"].get(_index_key(doc, index["key"]), ignore_id)
+            if owner != ignore_id:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {name}")
+
+    def _store(self, doc: Dict) -> None:
+        self._docs[doc["_id"]] = doc
+        for _, index in self._unique_indexes():
+            index["entries"][_index_key(doc, index["key"])] = doc["_id"]
+
+    def _remove(self, doc: Dict) -> None:
+        del self._docs[doc["_id"]]
+        for _, index in self._unique_indexes():
+            index["entries"].pop(_index_key(doc, index["key"]), None)
+
+    def _insert(self, doc: Dict) -> Any:
+        doc = copy.deepcopy(doc)
+        doc.setdefault("_id", ObjectId())
+        if doc["_id"] in self._docs:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id_")
+        self._check_unique(doc)
+        self._store(doc)
+        return doc["_id"]
+
+    def _matching(self, query: Optional[Dict]) -> List[Dict]:
+        return [d for d in self._docs.values() if matches(d, query)]
+
+    def find(self, filter: Optional[Dict] = None, projection: Optional[Dict] = None,
+             sort=None, skip: int = 0, limit: int = 0, session=None) -> InMemoryCursor:
+        self.commands["find"] += 1
+        cursor = InMemoryCursor(self._matching(filter), projection)
+        if sort:
+            cursor.sort(sort)
+        return cursor.skip(skip).limit(limit)
+
+    async def find_one(self, filter: Optional[Dict] = None, projection: Optional[Dict] = None,
+                       sort=None, session=None) -> Optional[Dict]:
+        results = await self.find(filter, projection, sort=sort, limit=1).to_list()
+        return results[0] if results else None
+
+    async def insert_one(self, document: Dict, session=None) -> InsertOneResult:
+        self.commands["insert"] += 1
+        inserted_id = self._insert(document)
+        document.setdefault("_id", inserted_id)
+        return InsertOneResult(inserted_id, True)
+
+    async def insert_many(self, documents: List[Dict], ordered: bool = True, session=None) -> InsertManyResult:
+        self.commands["insert"] += 1
+        inserted_ids, write_errors = [], []
+        for index, document in enumerate(documents):
+            try:
+                inserted_ids.append(self._insert(document))
+                document.setdefault("_id", inserted_ids[-1])
+            except DuplicateKeyError as e:
+                write_errors.append({"index": index, "code": 11000, "errmsg": str(e), "op": document})
+                if ordered:
+                    break
+        if write_errors:
+            raise BulkWriteError({"writeErrors": write_errors, "nInserted": len(inserted_ids)})
+        return InsertManyResult(inserted_ids, True)
+
+    def _update(self, filter: Dict, update: Dict, upsert: bool, many: bool) -> UpdateResult:
+        targets = self._matching(filter)
+        if not many:
+            targets = targets[:1]
+
+        modified = 0
+        for doc in targets:
+            updated = copy.deepcopy(doc)
+            apply_update(updated, update)
+            if updated != doc:
+                self._check_unique(updated, ignore_id=doc["_id"])
+                self._remove(doc)
+                self._store(updated)
+                modified += 1
+
+        raw_result = {"n": len(targets), "nModified": modified}
+        if not targets and upsert:
+            new_doc = {k: v for k, v in filter.items() if not k.startswith("$") and not isinstance(v, dict)}
+            apply_update(new_doc, update, is_insert=True)
+            raw_result["upserted"] = self._insert(new_doc)
+            raw_result["n"] = 1
+        return UpdateResult(raw_result, True)
+
+    async def update_one(self, filter: Dict, update: Dict, upsert: bool = False, session=None) -> UpdateResult:
+        self.commands["update"] += 1
+        return self._update(filter, update, upsert, many=False)
+
+    async def update_many(self, filter: Dict, update: Dict, upsert: bool = False, session=None) -> UpdateResult:
+        self.commands["update"] += 1
+        return self._update(filter, update, upsert, many=True)
+
+    async def find_one_and_update(self, filter: Dict, update: Dict, projection: Optional[Dict] = None,
+                                  sort=None, upsert: bool = False,
+                                  return_document: bool = ReturnDocument.BEFORE, session=None) -> Optional[Dict]:
+        self.commands["findAndModify"] += 1
+        targets = self._matching(filter)
+        if sort:
+            targets = InMemoryCursor(targets).sort(sort)._docs
+        if not targets:
+            if not upsert:
+                return None
+            result = self._update(filter, update, upsert=True, many=False)
+            return _project(copy.deepcopy(self._docs[result.upserted_id]), projection) if return_document else None
+
+        before = targets[0]
+        self._update({"_id": before["_id"]}, update, upsert=False, many=False)
+        doc = self._docs[before["_id"]] if return_document else before
+        return _project(copy.deepcopy(doc), projection)
+
+    async def bulk_write(self, requests: List, ordered: bool = True, session=None) -> BulkWriteResult:
+        # MongoDB sends one command per kind of operation in the batch
+        for command, kinds in (("insert", InsertOne), ("update", (UpdateOne, UpdateMany)),
+                               ("delete", (DeleteOne, DeleteMany))):
+            if any(isinstance(request, kinds) for request in requests):
+                self.commands[command] += 1
+        raw_result = {"nInserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "nUpserted": 0,
+                      "upserted": [], "writeErrors": []}
+        for index, request in enumerate(requests):
+            try:
+                if isinstance(request, InsertOne):
+                    self._insert(request._doc)
+                    raw_result["nInserted"] += 1
+                elif isinstance(request, (UpdateOne, UpdateMany)):
+                    result = self._update(request._filter, request._doc, bool(request._upsert),
+                                          many=isinstance(request, UpdateMany))
+                    if result.upserted_id is not None:
+                        raw_result["nUpserted"] += 1
+                        raw_result["upserted"].append({"index": index, "_id": result.upserted_id})
+                    else:
+                        raw_result["nMatched"] += result.matched_count
+                        raw_result["nModified"] += result.modified_count
+                elif isinstance(request, (DeleteOne, DeleteMany)):
+                    targets = self._matching(request._filter)
+                    if isinstance(request, DeleteOne):
+                        targets = targets[:1]
+                    for doc in targets:
+                        self._remove(doc)
+                    raw_result["nRemoved"] += len(targets)
+                else:
+                    raise ValueError(f"Unsupported bulk operation {request!r}")
+            except DuplicateKeyError as e:
+                raw_result["writeErrors"].append({"index": index, "code": 11000, "errmsg": str(e)})
+                if ordered:
+                    break
+        if raw_result["writeErrors"]:
+            raise BulkWriteError(raw_result)
+        return BulkWriteResult(raw_result, True)
+
+    async def delete_one(self, filter: Dict, session=None) -> DeleteResult:
+        self.commands["delete"] += 1
+        targets = self._matching(filter)[:1]
+        for doc in targets:
+            self._remove(doc)
+        return DeleteResult({"n": len(targets)}, True)
+
+    async def delete_many(self, filter: Dict, session=None) -> DeleteResult:
+        self.commands["delete"] += 1
+        targets = self._matching(filter)
+        for doc in targets:
+            self._remove(doc)
+        return DeleteResult({"n": len(targets)}, True)
+
+    async def count_documents(self, filter: Dict, session=None) -> int:
+        self.commands["aggregate"] += 1
+        return len(self._matching(filter))
+
+    async def create_index(self, keys, unique: bool = False, name: Optional[str] = None,
+                           weights: Optional[Dict[str, int]] = None) -> str:
+        """Record an index. Unique indexes are enforced; text indexes are only recorded
+        (the in-memory backend searches with search.InvertedIndexSearch instead of $text)."""
+        keys = [(keys, 1)] if isinstance(keys, str) else list(keys)
+        name = name or "_".join(f"{field}_{direction}" for field, direction in keys)
+        index = {"key": keys, "unique": unique}
+        text_fields = [field for field, direction in keys if direction == "text"]
+        if text_fields:
+            # Reported the way MongoDB describes text indexes
+            index["key"] = [("_fts", "text"), ("_ftsx", 1)]
+            index["weights"] = {field: (weights or {}).get(field, 1) for field in text_fields}
+        if unique:
+            index["entries"] = {}
+            for doc in self._docs.values():
+                key = _index_key(doc, keys)
+                if key in index["entries"]:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {name}")
+                index["entries"][key] = doc["_id"]
+        self._indexes[name] = index
+        return name
+
+    async def drop_index(self, name: str) -> None:
+        del self._indexes[name]
+
+    async def index_information(self) -> Dict[str, Dict]:
+        info = {}
+        for name, index in self._indexes.items():
+            info[name] = {"key": list(index["key"])}
+            if "weights" in index:
+                info[name]["weights"] = dict(index["weights"])
+            if index["unique"] and name != "_id_":
+                info[name]["unique"] = True
+        return info
+
+
+class InMemoryDatabase:
+    """Async database handing out in-memory collections by name."""
+
+    def __init__(self, name: str = "memory"):
+        self.name = name
+        self.commands: Counter = Counter()
+        self._collections: Dict[str, InMemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> InMemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = InMemoryCollection(name, self.commands)
+        return self._collections[name]
@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from service_client import service
+
+logger = logging.getLogger(__name__)
+
+# Dispatcher tuning
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 100))
+OUTBOX_POLL_SECONDS = float(os.getenv("OUTBOX_POLL_SECONDS", 2))
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", 10))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 10))
+OUTBOX_BACKOFF_BASE_SECONDS = float(os.getenv("OUTBOX_BACKOFF_BASE_SECONDS", 1))
+OUTBOX_BACKOFF_MAX_SECONDS = float(os.getenv("OUTBOX_BACKOFF_MAX_SECONDS", 300))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", 60))
+CALENDAR_TIMEOUT_SECONDS = float(os.getenv("CALENDAR_TIMEOUT_SECONDS", 5))
+
+
+class DeliveryError(Exception):
+    """Raised when the calendar service rejects or fails an outbox delivery."""
+
+
+def backoff_delay(attempts: int) -> float:
+    """Exponential backoff with full jitter for the given number of failed attempts."""
+    return random.uniform(0, min(OUTBOX_BACKOFF_MAX_SECONDS, OUTBOX_BACKOFF_BASE_SECONDS * 2 ** attempts))
+
+
+def coalesce(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge the queued changes for one calendar event into a single request.
+
+    A create followed by updates becomes one create carrying the final state;
+    a run of updates becomes one update.
+    """
+    payload = {}
+    for entry in entries:
+        payload.update(entry["payload"])
+    return {"action": entries[0]["action"], "payload": payload}
+
+
+class CalendarOutbox:
+    """Durable queue of calendar changes, delivered in the background.
+
+    Changes are written to the outbox collection alongside the bug write that
+    caused them and delivered by `run()`, so request latency never depends on
+    the calendar service. The bug id is the calendar `referenceId` and acts as
+    the idempotency key: creates are sent as an update-by-reference first and
+    only posted when the event does not exist yet, so retries never duplicate.
+    """
+
+    def __init__(self, collection, calendar_url: str):
+        self.collection = collection
+        # Retries are handled by the outbox's own backoff, so the client sends each attempt once
+        self.calendar = service("calendar", calendar_url, timeout=CALENDAR_TIMEOUT_SECONDS, retries=0)
+        self._wakeup: Optional[asyncio.Event] = None
+
+    @staticmethod
+    def _entry(reference_id: str, action: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        now = datetime.utcnow()
+        return {
+            "reference_id": reference_id,
+            "action": action,
+            "payload": payload,
+            "status": "pending",
+            "attempts": 0,
+            "created_at": now,
+            "next_attempt_at": now,
+        }
+
+    async def enqueue(self, reference_id: str, action: str, payload: Dict[str, Any], session=None) -> None:
+        await self.collection.insert_one(self._entry(reference_id, action, payload), session=session)
+
+    async def enqueue_many(self, changes: List[Tuple[str, str, Dict[str, Any]]], session=None) -> None:
+        """Queue several (reference_id, action, payload) changes with one write."""
+        if changes:
+            await self.collection.insert_many([self._entry(*change) for change in changes], session=session)
+
+    def notify(self) -> None:
+        """Wake the dispatcher so new entries are delivered without waiting for the next poll."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def run(self) -> None:
+        """Deliver outbox entries until cancelled."""
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                attempted = await self.dispatch_once()
+            except Exception as e:
+                logger.error(f"Outbox dispatch failed: {e}")
+                attempted = 0
+
+            # Keep draining while batches are full, otherwise wait for new work
+            if attempted < OUTBOX_BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), OUTBOX_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def dispatch_once(self) -> int:
+        """Claim one batch of due entries and deliver it. Returns the number of entries attempted."""
+        claimed = await self._claim_batch()
+        if not claimed:
+            return 0
+
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in claimed:
+            groups.setdefault(entry["reference_id"], []).append(entry)
+        await self._release_out_of_order(groups)
+
+        semaphore = asyncio.Semaphore(OUTBOX_CONCURRENCY)
+
+        async def deliver_group(reference_id: str, entries: List[Dict[str, Any]]) -> None:
+            async with semaphore:
+                await self._deliver_group(reference_id, entries)
+
+        await asyncio.gather(*(deliver_group(ref, entries) for ref, entries in groups.items()))
+        return sum(len(entries) for entries in groups.values())
+
+    async def _claim_batch(self) -> List[Dict[str, Any]]:
+        """Lease a batch of due entries so concurrent dispatchers don't deliver them twice."""
+        now = datetime.utcnow()
+        due = {"$or": [
+            {"status": "pending", "next_attempt_at": {"$lte": now}},
+            {"status": "in_flight", "locked_until": {"$lte": now}},
+        ]}
+        candidates = await self.collection.find(due, {"_id": 1}).sort("_id", 1).limit(OUTBOX_BATCH_SIZE).to_list(length=None)
+        if not candidates:
+            return []
+
+        token = uuid.uuid4().hex
+        await self.collection.update_many(
+            {"$and": [{"_id": {"$in": [c["_id"] for c in candidates]}}, due]},
+            {"$set": {
+                "status": "in_flight",
+                "claim": token,
+                "locked_until": now + timedelta(seconds=OUTBOX_LEASE_SECONDS),
+            }}
+        )
+        return await self.collection.find({"claim": token}).sort("_id", 1).to_list(length=None)
+
+    async def _release_out_of_order(self, groups: Dict[str, List[Dict[str, Any]]]) -> None:
+        """Hand back groups that have an older undelivered entry held elsewhere.
+
+        This keeps changes to one calendar event in order, e.g. an update is
+        never sent while the create before it is still being retried.
+        """
+        token = next(iter(groups.values()))[0]["claim"]
+        older = self.collection.find(
+            {"reference_id": {"$in": list(groups)}, "claim": {"$ne": token}, "status": {"$ne": "failed"}},
+            {"reference_id": 1}
+        )
+        blocked = set()
+        async for entry in older:
+            if entry["_id"] < groups[entry["reference_id"]][0]["_id"]:
+                blocked.add(entry["reference_id"])
+        if not blocked:
+            return
+
+        ids = [entry["_id"] for ref in blocked for entry in groups.pop(ref)]
+        await self.collection.update_many(
+            {"_id": {"$in": ids}},
+            {"$set": {"status": "pending"}, "$unset": {"claim": ""}}
+        )
+
+    async def _deliver_group(self, reference_id: str, entries: List[Dict[str, Any]]) -> None:
+        ids = [entry["_id"] for entry in entries]
+        request = coalesce(entries)
+        try:
+            await self._send(reference_id, request["action"], request["payload"])
+        except Exception as e:
+            attempts = max(entry["attempts"] for entry in entries) + 1
+            if attempts >= OUTBOX_MAX_ATTEMPTS:
+                logger.error(f"Giving up on calendar {request['action']} for {reference_id} after {attempts} attempts: {e}")
+                update = {"status": "failed"}
+            else:
+                logger.warning(f"Calendar {request['action']} for {reference_id} failed (attempt {attempts}): {e}")
+                update = {
+                    "status": "pending",
+                    "next_attempt_at": datetime.utcnow() + timedelta(seconds=backoff_delay(attempts)),
+                }
+            await self.collection.update_many(
+                {"_id": {"$in": ids}},
+                {"$set": {**update, "attempts": attempts, "last_error": str(e)}, "$unset": {"claim": ""}}
+            )
+            return
+
+        await self.collection.delete_many({"_id": {"$in": ids}})
+
+    async def _send(self, reference_id: str, action: str, payload: Dict[str, Any]) -> None:
+        """Apply one change to the calendar service."""
+        response = await self._request("PUT", f"/api/events/by-reference/{reference_id}", payload)
+        if response.status_code == 404 and action == "create":
+            response = await self._request("POST", "/api/events", payload)
+        if response.status_code not in (200, 201):
+            raise DeliveryError(f"{response.status_code} {response.text}")
+
+    async def _request(self, method: str, path: str, payload: Dict[str, Any]) -> httpx.Response:
+        return await self.calendar.request(method, path, json=payload)
@@ -0,0 +1,160 @@
+import base64
+import json
+import os
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+# Largest page a client may request
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 1000))
+
+
+class PageRequest(BaseModel):
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
+    fields: Optional[List[str]] = None
+    sort_field: str = "_id"
+    descending: bool = False
+
+
+def page_request(
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    sort: str = "_id",
+) -> PageRequest:
+    """Parse the paging query parameters shared by the list endpoints.
+
+    `sort` is a field name, prefixed with "-" for descending order, and
+    `fields` is a comma-separated list of fields to return.
+    """
+    return PageRequest(
+        limit=limit,
+        cursor=cursor,
+        fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None,
+        sort_field=sort.lstrip("-") or "_id",
+        descending=sort.startswith("-"),
+    )
+
+
+def encode_cursor(doc: Dict[str, Any], sort_field: str) -> str:
+    """Encode the position after a document as an opaque cursor."""
+    position = {"id": str(doc["_id"])}
+    if sort_field != "_id":
+        position["v"] = doc.get(sort_field)
+    return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Decode a cursor produced by encode_cursor."""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        position["id"] = ObjectId(position["id"])
+        return position
+    except (ValueError, KeyError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_offset_cursor(offset: int) -> str:
+    """Encode a result offset as an opaque cursor, for ranked results that can't be keyset paged."""
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode("utf-8")).decode("ascii")
+
+
+def decode_offset_cursor(cursor: Optional[str]) -> int:
+    """Decode a cursor produced by encode_offset_cursor (no cursor means the first page)."""
+    if not cursor:
+        return 0
+    try:
+        offset = int(json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))["offset"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return offset
+
+
+def keyset_filter(page: PageRequest) -> Optional[Dict[str, Any]]:
+    """Build the query that selects documents after the page cursor."""
+    if not page.cursor:
+        return None
+    position = decode_cursor(page.cursor)
+    op = "$lt" if page.descending else "$gt"
+    if page.sort_field == "_id":
+        return {"_id": {op: position["id"]}}
+
+    # Null and missing values sort before everything else, but $gt/$lt never match them (or against them)
+    value = position.get("v")
+    same_value = {page.sort_field: value, "_id": {op: position["id"]}}
+    if value is None:
+        if page.descending:
+            return same_value
+        return {"$or": [same_value, {page.sort_field: {"$ne": None}}]}
+    after = [{page.sort_field: {op: value}}, same_value]
+    if page.descending:
+        after.append({page.sort_field: None})
+    return {"$or": after}
+
+
+def created_range_filter(created_after=None, created_before=None) -> Dict[str, Any]:
+    """Filter on creation time using the timestamp embedded in ObjectIds."""
+    bounds = {}
+    if created_after:
+        bounds["$gte"] = ObjectId.from_datetime(created_after)
+    if created_before:
+        bounds["$lt"] = ObjectId.from_datetime(created_before)
+    return {"_id": bounds} if bounds else {}
+
+
+async def stream_json_array(docs, serialize) -> AsyncIterator[bytes]:
+    """Stream documents as a JSON array without building the whole response."""
+    yield b"["
+    first = True
+    if hasattr(docs, "__aiter__"):
+        async for doc in docs:
+            yield (b"" if first else b",") + json.dumps(serialize(doc), default=str).encode("utf-8")
+            first = False
+    else:
+        for doc in docs:
+            yield (b"" if first else b",") + json.dumps(serialize(doc), default=str).encode("utf-8")
+            first = False
+    yield b"]"
+
+
+async def paginate(collection, query: Dict[str, Any], page: PageRequest, sort_fields: Iterable[str],
+                   serialize) -> StreamingResponse:
+    """Return one keyset page (or everything, if no limit is given) as a streamed JSON array.
+
+    When a limit is given and more documents follow, the cursor for the next
+    page is returned in the X-Next-Cursor header.
+    """
+    if page.sort_field != "_id" and page.sort_field not in sort_fields:
+        raise HTTPException(status_code=400, detail=f"Cannot sort by '{page.sort_field}'")
+
+    after = keyset_filter(page)
+    if after:
+        query = {"$and": [query, after]} if query else after
+
+    projection = None
+    if page.fields:
+        projection = {field: 1 for field in page.fields}
+        projection[page.sort_field] = 1
+
+    direction = -1 if page.descending else 1
+    sort = [(page.sort_field, direction)]
+    if page.sort_field != "_id":
+        sort.append(("_id", direction))
+
+    cursor = collection.find(query, projection).sort(sort)
+    if not page.limit:
+        return StreamingResponse(stream_json_array(cursor, serialize), media_type="application/json")
+
+    docs = await cursor.limit(page.limit + 1).to_list(length=None)
+    headers = {}
+    if len(docs) > page.limit:
+        docs = docs[:page.limit]
+        headers["X-Next-Cursor"] = encode_cursor(docs[-1], page.sort_field)
+    return StreamingResponse(stream_json_array(docs, serialize), media_type="application/json", headers=headers)
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Messages buffered per subscriber; a subscriber that falls this far behind is disconnected
+REALTIME_QUEUE_SIZE = int(os.getenv("REALTIME_QUEUE_SIZE", 100))
+
+# Idle time after which a keep-alive is sent, so dead connections are noticed
+REALTIME_HEARTBEAT_SECONDS = float(os.getenv("REALTIME_HEARTBEAT_SECONDS", 15))
+
+# Yielded by BugEventBroker.listen() in place of a message when the subscriber was idle
+HEARTBEAT = None
+
+# Yielded last by BugEventBroker.listen() when the subscriber was dropped for falling behind
+LAGGED = b""
+
+
+def bug_message(bug_id: str, event: Dict[str, Any], state: Dict[str, Any]) -> Dict[str, Any]:
+    """Describe a logged bug event, with the bug's assignee, client and status after it, for subscribers."""
+    return {
+        "bug_id": bug_id,
+        **event,
+        "t": event["t"].isoformat(),
+        "employee_id": state.get("employee_id"),
+        "client_id": state.get("client_id"),
+        "status": state["status"],
+    }
+
+
+class Subscriber:
+    def __init__(self, employee_id: Optional[str], client_id: Optional[str], queue_size: int):
+        self.employee_id = employee_id
+        self.client_id = client_id
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.lagged = False
+
+    @property
+    def key(self) -> str:
+        if self.employee_id:
+            return f"employee:{self.employee_id}"
+        if self.client_id:
+            return f"client:{self.client_id}"
+        return "all"
+
+    def matches(self, message: Dict[str, Any]) -> bool:
+        # Only the filter that isn't the subscription key needs checking here
+        return not (self.employee_id and self.client_id) or message.get("client_id") == self.client_id
+
+
+class BugEventBroker:
+    """Fans bug events out to the subscribers of this process.
+
+    Subscribers are indexed by their filter (an employee, a client or
+    everything), so publishing only visits the subscribers that want a
+    message, and each message is encoded once for all of them. Every
+    subscriber has a bounded queue; one that doesn't keep up is dropped after
+    its buffered messages rather than holding memory or slowing the others,
+    and is expected to reload its lists and subscribe again.
+    """
+
+    def __init__(self, queue_size: int = REALTIME_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers: Dict[str, Set[Subscriber]] = {}
+
+    def subscribe(self, employee_id: Optional[str] = None, client_id: Optional[str] = None) -> Subscriber:
+        subscriber = Subscriber(employee_id, client_id, self.queue_size)
+        self.subscribers.setdefault(subscriber.key, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        subscribers = self.subscribers.get(subscriber.key)
+        if subscribers is not None:
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self.subscribers[subscriber.key]
+
+    def count(self) -> int:
+        return sum(len(subscribers) for subscribers in self.subscribers.values())
+
+    def publish(self, messages: List[Dict[str, Any]]) -> None:
+        """Queue messages (see bug_message) for every subscriber whose filter matches."""
+        for message in messages:
+            keys = {"all", f"client:{message.get('client_id')}", f"employee:{message.get('employee_id')}"}
+            if message["k"] == "assign" and message.get("from"):
+                # The previous assignee sees the bug leave
+                keys.add(f"employee:{message['from']}")
+            targets = [subscriber for key in keys for subscriber in self.subscribers.get(key, ())
+                       if subscriber.matches(message)]
+            if not targets:
+                continue
+            data = json.dumps(message).encode("utf-8")
+            for subscriber in targets:
+                try:
+                    subscriber.queue.put_nowait(data)
+                except asyncio.QueueFull:
+                    logger.warning(f"Dropping bug event subscriber {subscriber.key}: {self.queue_size} messages behind")
+                    subscriber.lagged = True
+                    self.unsubscribe(subscriber)
+
+    async def listen(self, subscriber: Subscriber) -> AsyncIterator[Optional[bytes]]:
+        """Yield a subscriber's encoded messages, HEARTBEAT when idle and LAGGED before ending if it fell behind.
+
+        The subscriber is removed when the iteration stops.
+        """
+        try:
+            while True:
+                if subscriber.lagged and subscriber.queue.empty():
+                    yield LAGGED
+                    return
+                try:
+                    yield await asyncio.wait_for(subscriber.queue.get(), REALTIME_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT
+        finally:
+            self.unsubscribe(subscriber)
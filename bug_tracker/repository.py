@@ -0,0 +1,146 @@
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from bug_status import BugStatus, allowed_sources
+from stats import STATE_PROJECTION
+
+# Bugs reassigned per round of a bulk assignment
+ASSIGN_BATCH_SIZE = int(os.getenv("ASSIGN_BATCH_SIZE", 1000))
+
+# A bug's (before, after) state for one write
+BugChange = Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+class Repository:
+    """Async data access for a single collection keyed by a business id."""
+
+    id_field = "_id"
+    # Fields list endpoints may sort by (besides _id)
+    sort_fields = ()
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def get(self, item_id: str, session=None) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({self.id_field: item_id}, session=session)
+
+    async def exists(self, item_id: str) -> bool:
+        return await self.get(item_id) is not None
+
+    async def insert(self, document: Dict[str, Any], session=None) -> None:
+        """Insert a document, raising DuplicateKeyError if its id is already taken."""
+        await self.collection.insert_one(document, session=session)
+
+    async def create(self, document: Dict[str, Any], session=None) -> bool:
+        """Insert a document, returning False if its id is already taken."""
+        try:
+            await self.insert(document, session=session)
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def list(self, query: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        return await self.collection.find(query or {}).to_list(length=None)
+
+
+class BugRepository(Repository):
+    id_field = "bug_id"
+    sort_fields = ("bug_id", "title", "status", "employee_id")
+
+    async def assign(self, bug_id: str, employee_id: str, session=None) -> Optional[Dict[str, Any]]:
+        """Assign a bug and return its previous state (see STATE_PROJECTION), or None if it doesn't exist."""
+        return await self.collection.find_one_and_update(
+            {"bug_id": bug_id},
+            {"$set": {"employee_id": employee_id}},
+            projection=STATE_PROJECTION,
+            return_document=ReturnDocument.BEFORE,
+            session=session
+        )
+
+    async def assign_many(self, query: Dict[str, Any], employee_id: str,
+                          on_assigned: Callable[[List[BugChange]], Awaitable[None]], session=None) -> int:
+        """Assign all matching bugs not already assigned to the employee.
+
+        Returns how many bugs changed. `on_assigned` is awaited with the
+        (before, after) states of each round's reassigned bugs. Each round
+        updates bugs grouped by their previous (employee, status), so only bugs
+        that were actually reassigned are reported.
+        """
+        assigned = 0
+        cursor = self.collection.find(
+            {"$and": [query, {"employee_id": {"$ne": employee_id}}]},
+            STATE_PROJECTION,
+            session=session
+        )
+
+        async def flush(batch):
+            nonlocal assigned
+            groups: Dict[Tuple[Optional[str], str], List[Dict[str, Any]]] = {}
+            for bug in batch:
+                groups.setdefault((bug.get("employee_id"), bug["status"]), []).append(bug)
+            changes = []
+            for (previous_employee, status), group in groups.items():
+                ids = [bug["_id"] for bug in group]
+                result = await self.collection.update_many(
+                    {"_id": {"$in": ids}, "employee_id": previous_employee, "status": status},
+                    {"$set": {"employee_id": employee_id}},
+                    session=session
+                )
+                if result.modified_count < len(group):
+                    # Some bugs changed underneath us; report only the ones this round moved
+                    moved = await self.collection.find(
+                        {"_id": {"$in": ids}, "employee_id": employee_id, "status": status}, {"_id": 1},
+                        session=session
+                    ).to_list(length=None)
+                    moved_ids = {bug["_id"] for bug in moved}
+                    group = [bug for bug in group if bug["_id"] in moved_ids][:result.modified_count]
+                assigned += result.modified_count
+                changes.extend((bug, {**bug, "employee_id": employee_id}) for bug in group)
+            if changes:
+                await on_assigned(changes)
+
+        batch = []
+        async for bug in cursor:
+            batch.append(bug)
+            if len(batch) >= ASSIGN_BATCH_SIZE:
+                await flush(batch)
+                batch = []
+        if batch:
+            await flush(batch)
+        return assigned
+
+    async def transition(self, bug_id: str, employee_id: str, status: BugStatus,
+                         session=None) -> Optional[Dict[str, Any]]:
+        """Atomically move an employee's bug to `status` if the state machine allows it.
+
+        Returns the bug's previous state (see STATE_PROJECTION), or None if the
+        bug doesn't exist, isn't assigned to the employee, or can't move to
+        `status` from its current one.
+        """
+        return await self.collection.find_one_and_update(
+            {"bug_id": bug_id, "employee_id": employee_id, "status": {"$in": allowed_sources(status)}},
+            {"$set": {"status": status.value}},
+            projection=STATE_PROJECTION,
+            return_document=ReturnDocument.BEFORE,
+            session=session
+        )
+
+
+class EmployeeRepository(Repository):
+    id_field = "employee_id"
+    sort_fields = ("employee_id", "name", "bugs_completed", "bugs_pending")
+
+    async def apply_counter_deltas(self, deltas: Dict[str, Dict[str, int]], session=None) -> None:
+        """Apply bugs_pending/bugs_completed changes for several employees in one round trip."""
+        requests = [UpdateOne({"employee_id": employee_id}, {"$inc": fields})
+                    for employee_id, fields in deltas.items() if fields]
+        if requests:
+            await self.collection.bulk_write(requests, ordered=False, session=session)
+
+
+class ClientRepository(Repository):
+    id_field = "client_id"
+    sort_fields = ("client_id", "name")
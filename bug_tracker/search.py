@@ -0,0 +1,226 @@
+import bisect
+import logging
+import math
+import re
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from fastapi import HTTPException
+from pymongo import UpdateOne
+
+from memory_db import InMemoryCollection
+
+logger = logging.getLogger(__name__)
+
+# Searched fields and how much a match in each counts (mirrors the text index in indexes.py)
+TEXT_WEIGHTS = {"title": 10, "description": 1}
+
+# BM25 parameters for the embedded index
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Bugs fetched per round while filtering ranked results
+_FILTER_BATCH_SIZE = 200
+
+# Bugs updated per round when storing search tokens on existing bugs
+_BACKFILL_BATCH_SIZE = 1000
+
+# Bug field holding the distinct words of the searched fields, indexed so prefixes are index range scans
+TOKENS_FIELD = "search_tokens"
+
+_TOKEN_RE = re.compile(r"\w+")
+_PHRASE_RE = re.compile(r'"([^"]*)"')
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def search_tokens(doc: Dict[str, Any]) -> List[str]:
+    """Get the distinct words of a bug's searched fields, stored in TOKENS_FIELD."""
+    return sorted({token for field in TEXT_WEIGHTS for token in tokenize(doc.get(field) or "")})
+
+
+class SearchQuery:
+    """A parsed search string: plain terms, "quoted phrases" and prefix* terms.
+
+    A bug matches if it contains every phrase, a word starting with every
+    prefix and, when plain terms are given, at least one of them. Results are
+    ranked by relevance.
+    """
+
+    def __init__(self, text: str):
+        self.phrases: List[List[str]] = [tokens for tokens in map(tokenize, _PHRASE_RE.findall(text)) if tokens]
+        self.terms: List[str] = []
+        self.prefixes: List[str] = []
+        for word in _PHRASE_RE.sub(" ", text).split():
+            tokens = tokenize(word)
+            if not tokens:
+                continue
+            if word.endswith("*") and len(tokens) == 1:
+                self.prefixes.append(tokens[0])
+            else:
+                self.terms.extend(tokens)
+        if not (self.phrases or self.terms or self.prefixes):
+            raise HTTPException(status_code=400, detail="Search query has no words")
+
+
+class TextIndexSearch:
+    """Search through the MongoDB text index on title and description.
+
+    Prefix terms aren't supported by text indexes, so they are matched with a
+    start-anchored regex on the indexed TOKENS_FIELD word array, which MongoDB
+    runs as a range scan of that index rather than a scan of the bugs.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def load(self) -> None:
+        """Store the search tokens of bugs written before they were kept; MongoDB maintains the indexes."""
+        filled, requests = 0, []
+        fields = {field: 1 for field in TEXT_WEIGHTS}
+        async for doc in self.collection.find({TOKENS_FIELD: {"$exists": False}}, fields):
+            requests.append(UpdateOne({"_id": doc["_id"]}, {"$set": {TOKENS_FIELD: search_tokens(doc)}}))
+            if len(requests) >= _BACKFILL_BATCH_SIZE:
+                await self.collection.bulk_write(requests, ordered=False)
+                filled += len(requests)
+                requests = []
+        if requests:
+            await self.collection.bulk_write(requests, ordered=False)
+            filled += len(requests)
+        if filled:
+            logger.info(f"Stored search tokens on {filled} bugs")
+
+    def add(self, docs: Iterable[Dict[str, Any]]) -> None:
+        """Nothing to do; MongoDB maintains the text index."""
+
+    async def search(self, query: SearchQuery, filters: Dict[str, Any], offset: int,
+                     limit: int) -> List[Dict[str, Any]]:
+        """Return up to `limit` matching bugs after skipping `offset`, best matches first."""
+        clauses = [filters] if filters else []
+        text = " ".join(query.terms + [f'"{" ".join(phrase)}"' for phrase in query.phrases])
+        if text:
+            clauses.append({"$text": {"$search": text}})
+        for prefix in query.prefixes:
+            # Tokens are lowercase, so a case-sensitive ^prefix regex has tight index bounds
+            clauses.append({TOKENS_FIELD: {"$regex": f"^{re.escape(prefix)}"}})
+
+        if text:
+            score = {"score": {"$meta": "textScore"}}
+            cursor = self.collection.find({"$and": clauses}, score).sort([("score", {"$meta": "textScore"}), ("_id", 1)])
+        else:
+            cursor = self.collection.find({"$and": clauses}).sort("_id", 1)
+        return await cursor.skip(offset).limit(limit).to_list(length=None)
+
+
+class InvertedIndexSearch:
+    """Embedded inverted index with BM25 ranking, for the in-memory database.
+
+    Postings keep token positions so phrases can be checked, and a sorted
+    term list lets prefixes expand to the indexed terms they cover. The index
+    lives in process memory and is rebuilt from the collection by `load()`.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.postings: Dict[str, Dict[str, List[int]]] = {}
+        self.weighted_tf: Dict[str, Dict[str, float]] = {}
+        self.lengths: Dict[str, float] = {}
+        self.terms: List[str] = []
+
+    async def load(self) -> None:
+        """Index every bug in the collection."""
+        self.add([doc async for doc in self.collection.find({}, {"bug_id": 1, **{f: 1 for f in TEXT_WEIGHTS}})])
+
+    def add(self, docs: Iterable[Dict[str, Any]]) -> None:
+        """Index new bug documents."""
+        for doc in docs:
+            bug_id = doc["bug_id"]
+            if bug_id in self.lengths:
+                self._remove(bug_id)
+
+            position, length = 0, 0.0
+            for field, weight in TEXT_WEIGHTS.items():
+                tokens = tokenize(doc.get(field) or "")
+                for token in tokens:
+                    if token not in self.postings:
+                        self.postings[token] = {}
+                        self.weighted_tf[token] = {}
+                        bisect.insort(self.terms, token)
+                    self.postings[token].setdefault(bug_id, []).append(position)
+                    self.weighted_tf[token][bug_id] = self.weighted_tf[token].get(bug_id, 0) + weight
+                    position += 1
+                # Leave a gap so phrases never span two fields
+                position += 1
+                length += weight * len(tokens)
+            self.lengths[bug_id] = length
+
+    def _remove(self, bug_id: str) -> None:
+        for token in [t for t, docs in self.postings.items() if bug_id in docs]:
+            del self.postings[token][bug_id]
+            del self.weighted_tf[token][bug_id]
+        del self.lengths[bug_id]
+
+    def _expand(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self.terms, prefix)
+        end = bisect.bisect_left(self.terms, prefix + "\uffff")
+        return self.terms[start:end]
+
+    def _phrase_matches(self, phrase: List[str]) -> Set[str]:
+        candidates = set(self.postings.get(phrase[0], {}))
+        for token in phrase[1:]:
+            candidates &= set(self.postings.get(token, {}))
+        return {
+            bug_id for bug_id in candidates
+            if any(all(start + i in self.postings[token][bug_id] for i, token in enumerate(phrase[1:], start=1))
+                   for start in self.postings[phrase[0]][bug_id])
+        }
+
+    def _bm25(self, term: str, bug_id: str, average_length: float) -> float:
+        docs = self.weighted_tf.get(term, {})
+        tf = docs.get(bug_id)
+        if not tf:
+            return 0.0
+        idf = math.log(1 + (len(self.lengths) - len(docs) + 0.5) / (len(docs) + 0.5))
+        norm = 1 - BM25_B + BM25_B * self.lengths[bug_id] / average_length
+        return idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+
+    def rank(self, query: SearchQuery) -> List[Tuple[str, float]]:
+        """Get the (bug id, score) of all matching bugs, best matches first."""
+        required: List[Set[str]] = [self._phrase_matches(phrase) for phrase in query.phrases]
+        scored_terms = set(query.terms) | {token for phrase in query.phrases for token in phrase}
+        for prefix in query.prefixes:
+            expanded = self._expand(prefix)
+            scored_terms.update(expanded)
+            required.append(set().union(*(self.postings[term] for term in expanded)))
+
+        if query.terms:
+            required.append(set().union(*(self.postings.get(term, {}) for term in query.terms)))
+        matches = set.intersection(*required) if required else set()
+        if not matches:
+            return []
+
+        average_length = sum(self.lengths.values()) / len(self.lengths) or 1.0
+        scores = {bug_id: sum(self._bm25(term, bug_id, average_length) for term in scored_terms) for bug_id in matches}
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    async def search(self, query: SearchQuery, filters: Dict[str, Any], offset: int,
+                     limit: int) -> List[Dict[str, Any]]:
+        """Return up to `limit` matching bugs after skipping `offset`, best matches first."""
+        ranked = self.rank(query)
+        results: List[Dict[str, Any]] = []
+        for start in range(0, len(ranked), _FILTER_BATCH_SIZE):
+            chunk = ranked[start:start + _FILTER_BATCH_SIZE]
+            ids = [bug_id for bug_id, _ in chunk]
+            found = {doc["bug_id"]: doc async for doc in self.collection.find({**filters, "bug_id": {"$in": ids}})}
+            results.extend({**found[bug_id], "score": score} for bug_id, score in chunk if bug_id in found)
+            if len(results) >= offset + limit:
+                break
+        return results[offset:offset + limit]
+
+
+def search_backend(collection):
+    """Use the MongoDB text index, or the embedded index for the in-memory database."""
+    if isinstance(collection, InMemoryCollection):
+        return InvertedIndexSearch(collection)
+    return TextIndexSearch(collection)
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from pymongo import UpdateOne
+
+from bug_status import BugStatus, merge_deltas
+
+logger = logging.getLogger(__name__)
+
+# Days after creation a bug is due, unless it is created with its own due_at
+BUG_DEADLINE_DAYS = int(os.getenv("BUG_DEADLINE_DAYS", 7))
+
+# Stats documents written per bulk_write during a rebuild
+STATS_REBUILD_BATCH_SIZE = int(os.getenv("STATS_REBUILD_BATCH_SIZE", 1000))
+
+# Bug fields the stats and event log depend on; bug writes must read at least these to record a change
+STATE_PROJECTION = {
+    "_id": 1, "bug_id": 1, "employee_id": 1, "client_id": 1, "status": 1, "due_at": 1, "overdue_at": 1
+}
+
+# Stats are kept for every bug ("all"), its assignee and its client
+SCOPES = ("all", "employee", "client")
+
+
+def stats_id(scope: str, scope_id: str) -> str:
+    return f"{scope}:{scope_id}"
+
+
+def stats_deltas(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, int]]:
+    """Compute stats changes for a bug moving from state `before` to `after`.
+
+    States are bug documents with at least the STATE_PROJECTION fields; None
+    stands for a bug that doesn't exist. Open bugs the deadline scheduler has
+    marked with `overdue_at` are also counted as overdue, so the count matches
+    the bugs listed with `overdue=true`.
+    """
+    deltas: Dict[str, Dict[str, int]] = {}
+    for state, sign in ((before, -1), (after, 1)):
+        if not state:
+            continue
+        is_open = state["status"] != BugStatus.COMPLETED.value
+        fields = {"open" if is_open else "closed": sign}
+        if is_open and state.get("overdue_at"):
+            fields["overdue"] = sign
+        scope_ids = {"all": "all", "employee": state.get("employee_id"), "client": state.get("client_id")}
+        for scope, scope_id in scope_ids.items():
+            if scope_id:
+                merge_deltas(deltas, {stats_id(scope, scope_id): fields})
+
+    return {
+        key: {field: delta for field, delta in fields.items() if delta}
+        for key, fields in deltas.items()
+        if any(fields.values())
+    }
+
+
+def summarize(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Turn a stats document into open/closed/overdue counts."""
+    return {
+        "scope": doc["scope"],
+        "scope_id": doc["scope_id"],
+        "open": doc.get("open", 0),
+        "closed": doc.get("closed", 0),
+        "overdue": doc.get("overdue", 0),
+    }
+
+
+class BugStats:
+    """Materialized open/closed/overdue bug counts per employee, per client and overall.
+
+    Bug writes apply their changes here (in the same transaction, when
+    transactions are enabled) so reading a dashboard is a single document
+    lookup. `rebuild()` recomputes everything from the bug collection, e.g.
+    after a migration or a write that bypassed the service.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def apply(self, deltas: Dict[str, Dict[str, int]], session=None) -> None:
+        """Apply stats changes for several scopes in one round trip."""
+        requests = []
+        for key, fields in deltas.items():
+            if not fields:
+                continue
+            scope, scope_id = key.split(":", 1)
+            requests.append(UpdateOne(
+                {"_id": key},
+                {"$inc": fields, "$setOnInsert": {"scope": scope, "scope_id": scope_id}},
+                upsert=True
+            ))
+        if requests:
+            await self.collection.bulk_write(requests, ordered=False, session=session)
+
+    async def get(self, scope: str, scope_id: str) -> Dict[str, Any]:
+        doc = await self.collection.find_one({"_id": stats_id(scope, scope_id)})
+        return summarize(doc or {"scope": scope, "scope_id": scope_id})
+
+    async def rebuild(self, bug_collection) -> int:
+        """Recompute all stats from the bug collection. Returns the number of stats documents written.
+
+        Changes made while the rebuild runs may be lost, so run it when bug
+        writes are quiet.
+        """
+        totals: Dict[str, Dict[str, int]] = {}
+        async for bug in bug_collection.find({}, STATE_PROJECTION):
+            merge_deltas(totals, stats_deltas(None, bug))
+
+        await self.collection.delete_many({})
+        requests = []
+        for key, fields in totals.items():
+            scope, scope_id = key.split(":", 1)
+            doc = {"scope": scope, "scope_id": scope_id, "open": 0, "closed": 0, "overdue": 0, **fields}
+            requests.append(UpdateOne({"_id": key}, {"$set": doc}, upsert=True))
+            if len(requests) >= STATS_REBUILD_BATCH_SIZE:
+                await self.collection.bulk_write(requests, ordered=False)
+                requests = []
+        if requests:
+            await self.collection.bulk_write(requests, ordered=False)
+
+        logger.info(f"Rebuilt bug stats for {len(totals)} scopes")
+        return len(totals)
+
+
+if __name__ == "__main__":
+    # Rebuild the stats collection: python stats.py
+    from database import DATABASE_NAME, get_database
+
+    logging.basicConfig(level=logging.INFO)
+    db = get_database()
+    count = asyncio.run(BugStats(db["bug_stats"]).rebuild(db["bug_collection"]))
+    print(f"Rebuilt {count} stats documents in {DATABASE_NAME}.bug_stats")
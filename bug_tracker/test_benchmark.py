@@ -0,0 +1,18 @@
+import asyncio
+import json
+import os
+
+import benchmark
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+
+def test_benchmark_round_trips_match_the_baseline():
+    # Record a new baseline with: python benchmark.py --skip-latency --save-baseline benchmark_baseline.json
+    args = benchmark.parse_args(["--skip-latency"])
+    results = asyncio.run(benchmark.benchmark(args))
+    with open(BASELINE) as f:
+        baseline = json.load(f)
+    assert set(baseline) == {f"{r['scenario']}@{r['concurrency']}" for r in results}
+    assert benchmark.regressions(results, baseline, args.latency_threshold, args.round_trip_threshold,
+                                 check_latency=False) == []
@@ -0,0 +1,44 @@
+import asyncio
+import json
+
+from memory_db import InMemoryDatabase
+from pagination import PageRequest, paginate
+
+
+def serialize(doc):
+    return doc["bug_id"]
+
+
+async def read_pages(collection, sort_field, descending, limit):
+    """Follow X-Next-Cursor from the first page to the last and collect every bug id returned."""
+    seen, cursor = [], None
+    while True:
+        page = PageRequest(limit=limit, cursor=cursor, sort_field=sort_field, descending=descending)
+        response = await paginate(collection, {}, page, ("employee_id",), serialize)
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        seen += json.loads(body)
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            return seen
+
+
+def test_paging_across_null_sort_values_returns_every_bug_once():
+    async def run():
+        collection = InMemoryDatabase()["bugs"]
+        # b0-b2 are assigned, b3 has a null assignee and b4-b5 have none at all
+        await collection.insert_many([
+            {"bug_id": "b0", "employee_id": "e1"},
+            {"bug_id": "b1", "employee_id": "e2"},
+            {"bug_id": "b2", "employee_id": "e2"},
+            {"bug_id": "b3", "employee_id": None},
+            {"bug_id": "b4"},
+            {"bug_id": "b5"},
+        ])
+        for descending in (False, True):
+            for limit in (1, 2, 4):
+                seen = await read_pages(collection, "employee_id", descending, limit)
+                assert sorted(seen) == ["b0", "b1", "b2", "b3", "b4", "b5"], (descending, limit, seen)
+                unassigned_first = seen.index("b3") < seen.index("b0")
+                assert unassigned_first != descending, (descending, limit, seen)
+
+    asyncio.run(run())
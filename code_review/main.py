@@ -1,22 +1,29 @@
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import jwt
-import requests
 import os
 from datetime import datetime
 from typing import List, Optional
 from pydantic import BaseModel
 from enum import Enum
 from pymongo import MongoClient
+import service_client
 
 app = FastAPI()
 security = HTTPBearer()
 
+# Pooled, circuit-broken clients for the services we call
+auth_service = service_client.service("auth", "http://localhost:5001")
+
+@app.on_event("shutdown")
+async def close_service_clients():
+    await service_client.close_all()
+
 async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         token = credentials.credentials
-        response = requests.get(
-            "http://localhost:5001/users/verify",
+        response = await auth_service.get(
+            "/users/verify",
             headers={"Authorization": f"Bearer {token}"}
         )
         if response.status_code != 200:
@@ -59,12 +66,13 @@ class User(BaseModel):
 # Service URLs
 CALENDAR_SERVICE_URL = os.getenv("CALENDAR_SERVICE_URL", "http://calendar-service:5000")
 FORUM_SERVICE_URL = os.getenv("FORUM_SERVICE_URL", "http://forum-service:8004")
+calendar_service = service_client.service("calendar", CALENDAR_SERVICE_URL)
+forum_service = service_client.service("forum", FORUM_SERVICE_URL)
 
 # Add calendar service integration
 async def create_calendar_event(review_data: dict):
     try:
-        calendar_service_url = f"{CALENDAR_SERVICE_URL}/api/events/code-review"
-        response = requests.post(calendar_service_url, json=review_data)
+        response = await calendar_service.post("/api/events/code-review", json=review_data)
         return response.json()
     except Exception as e:
         print(f"Failed to create calendar event: {e}")
@@ -81,7 +89,7 @@ async def create_forum_topic_for_review(review_data: dict):
         }
 
         # Send request to forum service
-        response = requests.post(f"{FORUM_SERVICE_URL}/topics/", json=topic_data)
+        response = await forum_service.post("/topics/", json=topic_data)
 
         if response.status_code == 200:
             return response.json()
@@ -209,3 +217,8 @@ async def delete_user(user_id: str):
         raise HTTPException(status_code=404, detail="User not found")
     return {"message": "User deleted successfully"}
 
+
+@app.get("/metrics/services")
+async def service_metrics():
+    """Latency, error and circuit state of calls to other services"""
+    return service_client.metrics()
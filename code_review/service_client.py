@@ -0,0 +1,263 @@
+"""Client for calls between the services of this system.
+
+Each service is built from its own directory, so this module is copied into
+bug_tracker/, code_review/ and bug_tracker/forum-service/forum-service/.
+Keep the copies identical.
+
+Every target service gets a pool of keep-alive connections, its own
+timeouts, retries with jittered backoff for idempotent requests, a circuit
+breaker that fails fast while the target is down and a bulkhead capping
+concurrent requests, so one slow or failing service can't tie up its
+callers. Latency and error counts per target are available from `metrics()`.
+
+Settings come from the environment and can be overridden per target by
+suffixing the target's name, e.g. SERVICE_TIMEOUT_SECONDS_CALENDAR=2.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Methods that are safe to send again after a failure
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+# Responses worth retrying: the target (or a proxy in front of it) is briefly unavailable
+RETRY_STATUSES = {502, 503, 504}
+
+# Upper bounds of the latency histogram buckets
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _setting(name: str, target: str, default: float) -> float:
+    """Read a setting, preferring the per-target override (NAME_TARGET)."""
+    override = f"{name}_{target.upper().replace('-', '_')}"
+    return float(os.getenv(override, os.getenv(name, default)))
+
+
+class ServiceUnavailableError(Exception):
+    """Raised without contacting the target when it is known to be failing or overloaded."""
+
+
+class CircuitOpenError(ServiceUnavailableError):
+    pass
+
+
+class BulkheadFullError(ServiceUnavailableError):
+    pass
+
+
+class CircuitBreaker:
+    """Stop calling a target after consecutive failures, then let a single probe through
+    every `reset_seconds` until one succeeds."""
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self._opened_at = 0.0
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        now = time.monotonic()
+        if now - self._opened_at < self.reset_seconds:
+            return False
+        # Half open: this request is the probe; hold others back until it reports
+        self.state = "half_open"
+        self._opened_at = now
+        return True
+
+    def record_success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state == "closed":
+                logger.warning(f"Circuit for {self.name} opened after {self.failures} consecutive failures")
+            self.state = "open"
+            self._opened_at = time.monotonic()
+
+
+class Metrics:
+    """Request counts and a latency histogram for one target."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.rejected = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets: List[int] = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, duration_ms: float, failed: bool) -> None:
+        self.requests += 1
+        self.errors += failed
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if duration_ms <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th quantile (the slowest request if it is past the last bucket)."""
+        if not self.requests:
+            return 0.0
+        rank, seen = q * self.requests, 0
+        for i, count in enumerate(self.buckets[:-1]):
+            seen += count
+            if seen >= rank:
+                return float(LATENCY_BUCKETS_MS[i])
+        return self.max_ms
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "rejected": self.rejected,
+            "mean_ms": round(self.total_ms / self.requests, 2) if self.requests else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max_ms, 2),
+            "latency_buckets_ms": dict(zip([str(b) for b in LATENCY_BUCKETS_MS] + ["inf"], self.buckets)),
+        }
+
+
+class ServiceClient:
+    """Resilient async HTTP client for one target service."""
+
+    def __init__(self, name: str, base_url: str, timeout: Optional[float] = None, retries: Optional[int] = None):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout if timeout is not None else _setting("SERVICE_TIMEOUT_SECONDS", name, 5)
+        self.connect_timeout = min(self.timeout, _setting("SERVICE_CONNECT_TIMEOUT_SECONDS", name, 2))
+        self.retries = retries if retries is not None else int(_setting("SERVICE_RETRIES", name, 2))
+        self.retry_backoff = _setting("SERVICE_RETRY_BACKOFF_SECONDS", name, 0.2)
+        self.max_concurrency = int(_setting("SERVICE_MAX_CONCURRENCY", name, 20))
+        self.bulkhead_wait = _setting("SERVICE_BULKHEAD_WAIT_SECONDS", name, 1)
+        self.breaker = CircuitBreaker(
+            name,
+            int(_setting("SERVICE_BREAKER_FAILURES", name, 5)),
+            _setting("SERVICE_BREAKER_RESET_SECONDS", name, 30),
+        )
+        self.metrics = Metrics()
+        # Created on first use so they belong to the running event loop
+        self._client: Optional[httpx.AsyncClient] = None
+        self._bulkhead: Optional[asyncio.Semaphore] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.max_concurrency,
+                                    max_keepalive_connections=self.max_concurrency),
+            )
+        return self._client
+
+    async def request(self, method: str, path: str, retry: Optional[bool] = None, **kwargs) -> httpx.Response:
+        """Send a request to `path` on the target service.
+
+        Connection errors and 502/503/504 responses are retried with jittered
+        exponential backoff for idempotent methods (or any method with
+        retry=True). Raises ServiceUnavailableError without sending anything
+        when the circuit is open or the bulkhead stays full, and httpx errors
+        when the request fails on every attempt.
+        """
+        method = method.upper()
+        should_retry = retry if retry is not None else method in IDEMPOTENT_METHODS
+        attempts = 1 + (self.retries if should_retry else 0)
+
+        if self._bulkhead is None:
+            self._bulkhead = asyncio.Semaphore(self.max_concurrency)
+        try:
+            await asyncio.wait_for(self._bulkhead.acquire(), self.bulkhead_wait)
+        except asyncio.TimeoutError:
+            self.metrics.rejected += 1
+            raise BulkheadFullError(f"Too many concurrent requests to {self.name}")
+
+        try:
+            for attempt in range(attempts):
+                if not self.breaker.allow():
+                    self.metrics.rejected += 1
+                    raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+                if attempt:
+                    self.metrics.retries += 1
+
+                start = time.perf_counter()
+                try:
+                    response = await self._http().request(method, f"{self.base_url}{path}", **kwargs)
+                except httpx.HTTPError as e:
+                    self._record(start, failed=True)
+                    if attempt == attempts - 1:
+                        raise
+                    logger.warning(f"{self.name} {method} {path} failed (attempt {attempt + 1}): {e}")
+                else:
+                    self._record(start, failed=response.status_code >= 500)
+                    if response.status_code not in RETRY_STATUSES or attempt == attempts - 1:
+                        return response
+                await asyncio.sleep(random.uniform(0, self.retry_backoff * 2 ** attempt))
+        finally:
+            self._bulkhead.release()
+
+    def _record(self, start: float, failed: bool) -> None:
+        self.metrics.observe((time.perf_counter() - start) * 1000, failed)
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    async def put(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("PUT", path, **kwargs)
+
+    async def delete(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("DELETE", path, **kwargs)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"base_url": self.base_url, "circuit": self.breaker.state, **self.metrics.snapshot()}
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._bulkhead = None
+
+
+_clients: Dict[str, ServiceClient] = {}
+
+
+def service(name: str, base_url: str, **options) -> ServiceClient:
+    """Get the shared client for a target service, creating it on first use."""
+    if name not in _clients:
+        _clients[name] = ServiceClient(name, base_url, **options)
+    return _clients[name]
+
+
+def metrics() -> Dict[str, Dict[str, Any]]:
+    """Latency, error and circuit state for every target called so far."""
+    return {name: client.snapshot() for name, client in _clients.items()}
+
+
+async def close_all() -> None:
+    """Close pooled connections; call on application shutdown."""
+    for client in _clients.values():
+        await client.close()
@@ -3,8 +3,9 @@ from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-import requests
+import asyncio
 import os
+import service_client
 
 app = FastAPI()
 
@@ -18,6 +19,20 @@ API_GATEWAY = "http://localhost:8080/api"
 BUG_SERVICE = "http://localhost:8000"
 CODE_REVIEW_SERVICE = "http://localhost:8001"
 
+# Pooled, circuit-broken clients for the services we call
+api_gateway = service_client.service("api-gateway", API_GATEWAY)
+bug_service = service_client.service("bug-tracker", BUG_SERVICE)
+code_review_service = service_client.service("code-review", CODE_REVIEW_SERVICE)
+
+@app.on_event("shutdown")
+async def close_service_clients():
+    await service_client.close_all()
+
+@app.get("/metrics/services")
+async def service_metrics():
+    """Latency, error and circuit state of calls to other services"""
+    return service_client.metrics()
+
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     return templates.TemplateResponse("login.html", {"request": request})
@@ -25,8 +40,8 @@ async def home(request: Request):
 @app.post("/login")
 async def login(request: Request, username: str = Form(...), password: str = Form(...)):
     try:
-        response = requests.post(
-            f"{API_GATEWAY}/auth/login",
+        response = await api_gateway.post(
+            "/auth/login",
             json={"email": username, "password": password}
         )
         if response.status_code == 200:
@@ -54,8 +69,11 @@ async def dashboard(request: Request):
     # Fetch bugs and reviews
     headers = {"Authorization": f"Bearer {token}"}
     try:
-        bugs = requests.get(f"{BUG_SERVICE}/client/bugs", headers=headers).json()
-        reviews = requests.get(f"{CODE_REVIEW_SERVICE}/reviews", headers=headers).json()
+        bugs, reviews = await asyncio.gather(
+            bug_service.get("/client/bugs", headers=headers),
+            code_review_service.get("/reviews", headers=headers)
+        )
+        bugs, reviews = bugs.json(), reviews.json()
         
         return templates.TemplateResponse(
             "dashboard.html",
@@ -82,8 +100,8 @@ async def create_bug(
         return RedirectResponse(url="/")
     
     try:
-        response = requests.post(
-            f"{BUG_SERVICE}/client/bugs/create",
+        response = await bug_service.post(
+            "/client/bugs/create",
             headers={"Authorization": f"Bearer {token}"},
             json={"title": title, "description": description}
         )
@@ -106,8 +124,8 @@ async def create_review(
         return RedirectResponse(url="/")
     
     try:
-        response = requests.post(
-            f"{CODE_REVIEW_SERVICE}/reviews",
+        response = await code_review_service.post(
+            "/reviews",
             headers={"Authorization": f"Bearer {token}"},
             json={
                 "title": title,
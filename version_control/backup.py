@@ -0,0 +1,211 @@
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Base directory for repository backups
+BACKUP_DIR = os.environ.get("BACKUP_DIR", "/app/backups")
+
+# Seconds between scheduled snapshots of all repositories (0 disables the scheduler)
+BACKUP_INTERVAL_SECONDS = int(os.environ.get("BACKUP_INTERVAL_SECONDS", 3600))
+
+# Pause between repositories during a scheduled run so backups don't starve request I/O
+BACKUP_THROTTLE_SECONDS = float(os.environ.get("BACKUP_THROTTLE_SECONDS", 1.0))
+
+# A full snapshot starts a new chain after this many snapshots, so restores replay a bounded number of bundles
+# and a damaged bundle only affects the snapshots of its own chain
+BACKUP_FULL_EVERY = int(os.environ.get("BACKUP_FULL_EVERY", 24))
+
+# ... or once the last full snapshot is this old
+BACKUP_FULL_MAX_AGE_HOURS = float(os.environ.get("BACKUP_FULL_MAX_AGE_HOURS", 168))
+
+MANIFEST_NAME = "snapshots.json"
+
+
+class BackupError(Exception):
+    """Raised when a snapshot cannot be taken or restored."""
+
+
+class SnapshotNotFoundError(BackupError):
+    """Raised when a repository has no snapshot to restore from."""
+
+
+def _low_priority_prefix() -> List[str]:
+    """Get a command prefix that runs git at idle CPU and I/O priority when available."""
+    prefix = []
+    if shutil.which("ionice"):
+        prefix += ["ionice", "-c", "3"]
+    if shutil.which("nice"):
+        prefix += ["nice", "-n", "19"]
+    return prefix
+
+
+def _git(args: List[str], cwd: str, low_priority: bool = False) -> str:
+    """Run a git command and return its stdout."""
+    command = (_low_priority_prefix() if low_priority else []) + ["git"] + args
+    result = subprocess.run(command, cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise BackupError(result.stderr.strip() or f"git {args[0]} failed")
+    return result.stdout
+
+
+def _backup_path(repo_name: str) -> str:
+    """Get the backup directory for a repository."""
+    return os.path.join(BACKUP_DIR, repo_name)
+
+
+def list_snapshots(repo_name: str) -> List[Dict]:
+    """List the snapshots of a repository, oldest first."""
+    manifest_path = os.path.join(_backup_path(repo_name), MANIFEST_NAME)
+    if not os.path.isfile(manifest_path):
+        return []
+    with open(manifest_path, "r") as f:
+        return json.load(f)
+
+
+def _save_snapshots(repo_name: str, snapshots: List[Dict]) -> None:
+    """Atomically write the snapshot manifest of a repository."""
+    backup_path = _backup_path(repo_name)
+    fd, tmp_path = tempfile.mkstemp(dir=backup_path)
+    with os.fdopen(fd, "w") as f:
+        json.dump(snapshots, f, indent=2)
+    os.replace(tmp_path, os.path.join(backup_path, MANIFEST_NAME))
+
+
+def _read_refs(repo_path: str) -> Dict[str, str]:
+    """Get a mapping of ref name to commit for every ref in a repository."""
+    output = _git(["for-each-ref", "--format=%(objectname) %(refname)"], repo_path)
+    refs = {}
+    for line in output.splitlines():
+        sha, ref = line.split(" ", 1)
+        refs[ref] = sha
+    return refs
+
+
+def _needs_full_snapshot(snapshots: List[Dict]) -> bool:
+    """Check if the current chain of incremental snapshots is long or old enough to start a new one."""
+    last_full = next((i for i in range(len(snapshots) - 1, -1, -1) if snapshots[i]["full"]), None)
+    if last_full is None:
+        return True
+    if len(snapshots) - last_full >= BACKUP_FULL_EVERY:
+        return True
+    age = datetime.now(timezone.utc) - datetime.fromisoformat(snapshots[last_full]["created_at"])
+    return age.total_seconds() >= BACKUP_FULL_MAX_AGE_HOURS * 3600
+
+
+def snapshot_repository(repo_name: str, repo_path: str) -> Optional[Dict]:
+    """Write an incremental bundle of a repository and record it as a snapshot.
+
+    The bundle only contains objects that are not reachable from the refs of the
+    previous snapshot, except every BACKUP_FULL_EVERY snapshots or
+    BACKUP_FULL_MAX_AGE_HOURS, when a full bundle starts a new chain. Large
+    files are only pointers in git; their content in LFS_DIR is not part of
+    the bundles and has to be backed up separately. Returns the new snapshot,
+    or None if nothing changed.
+    """
+    snapshots = list_snapshots(repo_name)
+    previous = snapshots[-1] if snapshots else None
+
+    refs = _read_refs(repo_path)
+    if not refs:
+        return None
+    try:
+        head = _git(["symbolic-ref", "-q", "HEAD"], repo_path).strip()
+    except BackupError:
+        head = None
+
+    if previous and previous["refs"] == refs and previous["head"] == head:
+        return None
+
+    backup_path = _backup_path(repo_name)
+    os.makedirs(backup_path, exist_ok=True)
+
+    snapshot_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    bundle_name = f"{snapshot_id}.bundle"
+    bundle_path = os.path.join(backup_path, bundle_name)
+
+    # Exclude everything the previous snapshot already covers, unless a new chain is due
+    if previous and not _needs_full_snapshot(snapshots):
+        exclusions = sorted({f"^{sha}" for sha in previous["refs"].values()})
+    else:
+        exclusions = []
+    full = not exclusions
+
+    try:
+        _git(["bundle", "create", bundle_path, "--all"] + exclusions, repo_path, low_priority=True)
+    except BackupError as e:
+        if "empty bundle" in str(e):
+            # Only refs moved; no new objects to store
+            bundle_name = None
+        elif exclusions:
+            # Previous tips are gone (e.g. history rewritten and pruned); start a new full chain
+            logger.warning(f"Incremental bundle failed for '{repo_name}', taking a full snapshot: {e}")
+            _git(["bundle", "create", bundle_path, "--all"], repo_path, low_priority=True)
+            full = True
+        else:
+            raise
+
+    snapshot = {
+        "id": snapshot_id,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "bundle": bundle_name,
+        "full": full,
+        "refs": refs,
+        "head": head,
+        "size": os.path.getsize(bundle_path) if bundle_name else 0,
+    }
+    snapshots.append(snapshot)
+    _save_snapshots(repo_name, snapshots)
+
+    logger.info(f"Snapshot {snapshot_id} of '{repo_name}' written ({snapshot['size']} bytes)")
+    return snapshot
+
+
+def restore_repository(repo_name: str, target_path: str, snapshot_id: Optional[str] = None) -> Dict:
+    """Restore a repository into target_path from its snapshots.
+
+    Bundles from the last full snapshot up to the requested one (the latest by
+    default) are unpacked in order, then refs and HEAD are reset to match it.
+    """
+    snapshots = list_snapshots(repo_name)
+    if not snapshots:
+        raise SnapshotNotFoundError(f"No snapshots found for '{repo_name}'")
+
+    if snapshot_id is None:
+        end = len(snapshots) - 1
+    else:
+        ids = [s["id"] for s in snapshots]
+        if snapshot_id not in ids:
+            raise SnapshotNotFoundError(f"Snapshot '{snapshot_id}' not found")
+        end = ids.index(snapshot_id)
+
+    start = end
+    while start > 0 and not snapshots[start]["full"]:
+        start -= 1
+    chain = snapshots[start:end + 1]
+    target = chain[-1]
+
+    os.makedirs(target_path)
+    try:
+        _git(["init", "-q"], target_path)
+        for snapshot in chain:
+            if snapshot["bundle"]:
+                bundle_path = os.path.join(_backup_path(repo_name), snapshot["bundle"])
+                _git(["bundle", "unbundle", bundle_path], target_path)
+
+        for ref, sha in target["refs"].items():
+            _git(["update-ref", ref, sha], target_path)
+        if target["head"]:
+            _git(["symbolic-ref", "HEAD", target["head"]], target_path)
+            _git(["reset", "-q", "--hard"], target_path)
+    except Exception:
+        shutil.rmtree(target_path, ignore_errors=True)
+        raise
+
+    return target
@@ -0,0 +1,186 @@
+import base64
+import binascii
+import hashlib
+import json
+import os
+import re
+import tempfile
+import logging
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Base directory for the large-object store (shared by all repositories)
+LFS_DIR = os.environ.get("LFS_DIR", "/app/lfs")
+
+# Files larger than this are stored in the large-object tier instead of git
+LFS_THRESHOLD_BYTES = int(os.environ.get("LFS_THRESHOLD_BYTES", 1024 * 1024))
+
+# Size of the content-addressed chunks objects are split into
+LFS_CHUNK_SIZE = int(os.environ.get("LFS_CHUNK_SIZE", 1024 * 1024))
+
+POINTER_VERSION = "version https://git-lfs.github.com/spec/v1"
+
+# Pointer files are tiny; anything bigger than this is never parsed as one
+MAX_POINTER_SIZE = 512
+
+CHUNKS_DIR = os.path.join(LFS_DIR, "chunks")
+OBJECTS_DIR = os.path.join(LFS_DIR, "objects")
+
+# Object and chunk ids are lowercase hex SHA-256 digests; nothing else may reach a filesystem path
+DIGEST_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+# Well-formed standard base64 text: whole 4-character groups with padding only at the end
+BASE64_PATTERN = re.compile(r"(?:[A-Za-z0-9+/]{4})*(?:[A-Za-z0-9+/]{2}==|[A-Za-z0-9+/]{3}=)?")
+
+
+def is_digest(value: str) -> bool:
+    """Check if a value is a well-formed object or chunk id."""
+    return bool(DIGEST_PATTERN.match(value))
+
+
+def _sharded_path(base_dir: str, digest: str) -> str:
+    """Get the on-disk path for a digest, sharded by its first two characters."""
+    if not is_digest(digest):
+        raise ValueError(f"Invalid large object id '{digest}'")
+    return os.path.join(base_dir, digest[:2], digest)
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    """Write data to path via a temporary file so readers never see partial content."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def should_store(size: int) -> bool:
+    """Check if content of the given size belongs in the large-object tier."""
+    return size > LFS_THRESHOLD_BYTES
+
+
+def store_stream(stream: BinaryIO) -> Tuple[str, int, int]:
+    """Store a stream in chunks and return its object id, size and the number of chunks newly written.
+
+    Chunks are keyed by their SHA-256, so identical chunks across objects and
+    repositories are written only once.
+    """
+    object_hash = hashlib.sha256()
+    chunks = []
+    size = 0
+    new_chunks = 0
+
+    while True:
+        chunk = stream.read(LFS_CHUNK_SIZE)
+        if not chunk:
+            break
+        object_hash.update(chunk)
+        size += len(chunk)
+
+        chunk_id = hashlib.sha256(chunk).hexdigest()
+        chunk_path = _sharded_path(CHUNKS_DIR, chunk_id)
+        if not os.path.exists(chunk_path):
+            _write_atomic(chunk_path, chunk)
+            new_chunks += 1
+        chunks.append(chunk_id)
+
+    oid = object_hash.hexdigest()
+    manifest_path = _sharded_path(OBJECTS_DIR, oid)
+    if not os.path.exists(manifest_path):
+        manifest = {"size": size, "chunks": chunks}
+        _write_atomic(manifest_path, json.dumps(manifest).encode("utf-8"))
+        logger.info(f"Stored large object {oid} ({size} bytes, {len(chunks)} chunks)")
+
+    return oid, size, new_chunks
+
+
+class Base64Reader:
+    """File-like view that decodes base64 text a piece at a time, for store_stream.
+
+    The whole text is validated up front (raising binascii.Error), so a bad
+    upload fails before any chunk is stored.
+    """
+
+    def __init__(self, text: str):
+        if not BASE64_PATTERN.fullmatch(text):
+            raise binascii.Error("Invalid base64 content")
+        self.text = text
+        self.position = 0
+        self.pending = b""
+
+    @property
+    def size(self) -> int:
+        """Size of the decoded content."""
+        return len(self.text) // 4 * 3 - self.text[-2:].count("=")
+
+    def read(self, size: int) -> bytes:
+        needed = size - len(self.pending)
+        if needed > 0:
+            # Whole 4-character groups decode independently of the rest
+            end = self.position + (needed + 2) // 3 * 4
+            self.pending += base64.b64decode(self.text[self.position:end], validate=True)
+            self.position = end
+        data, self.pending = self.pending[:size], self.pending[size:]
+        return data
+
+
+def object_exists(oid: str) -> bool:
+    """Check if a large object is present in the store."""
+    return is_digest(oid) and os.path.isfile(_sharded_path(OBJECTS_DIR, oid))
+
+
+def object_size(oid: str) -> Optional[int]:
+    """Get the size of a stored large object, or None if it is missing or the id is invalid."""
+    if not object_exists(oid):
+        return None
+    with open(_sharded_path(OBJECTS_DIR, oid), "r") as f:
+        return json.load(f)["size"]
+
+
+def iter_object(oid: str) -> Iterator[bytes]:
+    """Yield the content of a large object chunk by chunk."""
+    with open(_sharded_path(OBJECTS_DIR, oid), "r") as f:
+        manifest = json.load(f)
+
+    for chunk_id in manifest["chunks"]:
+        with open(_sharded_path(CHUNKS_DIR, chunk_id), "rb") as f:
+            yield f.read()
+
+
+def make_pointer(oid: str, size: int) -> str:
+    """Build the pointer file committed to git in place of a large object."""
+    return f"{POINTER_VERSION}\noid sha256:{oid}\nsize {size}\n"
+
+
+def parse_pointer(text: str) -> Optional[Tuple[str, int]]:
+    """Parse pointer file content, returning (oid, size) or None if it is not a pointer."""
+    lines = text.splitlines()
+    if len(lines) < 3 or lines[0] != POINTER_VERSION:
+        return None
+
+    fields = dict(line.split(" ", 1) for line in lines[1:] if " " in line)
+    oid = fields.get("oid", "")
+    if not oid.startswith("sha256:") or not is_digest(oid[len("sha256:"):]) or not fields.get("size", "").isdigit():
+        return None
+
+    return oid[len("sha256:"):], int(fields["size"])
+
+
+def read_pointer(path: str) -> Optional[Tuple[str, int]]:
+    """Read a working-tree file and return (oid, size) if it is a pointer file."""
+    if os.path.getsize(path) > MAX_POINTER_SIZE:
+        return None
+
+    with open(path, "rb") as f:
+        data = f.read()
+
+    try:
+        return parse_pointer(data.decode("utf-8"))
+    except UnicodeDecodeError:
+        return None
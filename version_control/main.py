@@ -1,6 +1,7 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, Body
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, Body, Request
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional, Dict, Any
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Dict, Any, Tuple
 import os
 import shutil
 import git
@@ -9,7 +10,13 @@ import uuid
 from pydantic import BaseModel
 import logging
 import json
+import base64
+import binascii
+import io
+import asyncio
 from datetime import datetime
+import lfs
+import backup
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -51,6 +58,7 @@ class FileContent(BaseModel):
     commit_message: str
     author_name: str
     author_email: str
+    encoding: Optional[str] = "utf-8"  # "utf-8" or "base64" for binary files
 
 # Helper functions
 def get_repo_path(repo_name: str) -> str:
@@ -73,6 +81,25 @@ def get_repo(repo_name: str) -> git.Repo:
     except git.InvalidGitRepositoryError:
         raise HTTPException(status_code=400, detail=f"'{repo_name}' is not a valid Git repository")
 
+async def run_scheduled_backups():
+    """Periodically snapshot every repository, one at a time."""
+    while True:
+        await asyncio.sleep(backup.BACKUP_INTERVAL_SECONDS)
+        for name in os.listdir(REPOS_DIR):
+            if not os.path.exists(os.path.join(REPOS_DIR, name, ".git")):
+                continue
+            try:
+                await asyncio.to_thread(backup.snapshot_repository, name, get_repo_path(name))
+            except Exception as e:
+                logger.error(f"Error backing up repository '{name}': {str(e)}")
+            await asyncio.sleep(backup.BACKUP_THROTTLE_SECONDS)
+
+@app.on_event("startup")
+async def start_backup_scheduler():
+    """Start the backup scheduler if it is enabled."""
+    if backup.BACKUP_INTERVAL_SECONDS > 0:
+        asyncio.create_task(run_scheduled_backups())
+
 # API Endpoints
 @app.get("/")
 async def root():
@@ -139,12 +166,57 @@ async def delete_repository(repo_name: str):
         raise HTTPException(status_code=404, detail=f"Repository '{repo_name}' not found")
     
     try:
+        # Take a final snapshot so the repository can be restored later
+        await asyncio.to_thread(backup.snapshot_repository, repo_name, repo_path)
+        
         shutil.rmtree(repo_path)
         return {"message": f"Repository '{repo_name}' deleted successfully"}
     except Exception as e:
         logger.error(f"Error deleting repository: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to delete repository: {str(e)}")
 
+@app.get("/repos/{repo_name}/snapshots")
+async def list_snapshots(repo_name: str):
+    """List the backup snapshots of a repository."""
+    try:
+        return {"snapshots": backup.list_snapshots(repo_name)}
+    except Exception as e:
+        logger.error(f"Error listing snapshots: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to list snapshots: {str(e)}")
+
+@app.post("/repos/{repo_name}/snapshots")
+async def create_snapshot(repo_name: str):
+    """Take an incremental snapshot of a repository."""
+    get_repo(repo_name)
+    
+    try:
+        snapshot = await asyncio.to_thread(backup.snapshot_repository, repo_name, get_repo_path(repo_name))
+        if snapshot is None:
+            return {"message": f"No changes in '{repo_name}' since the last snapshot"}
+        return {"message": f"Snapshot '{snapshot['id']}' created successfully", "snapshot": snapshot}
+    except Exception as e:
+        logger.error(f"Error creating snapshot: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to create snapshot: {str(e)}")
+
+@app.post("/repos/{repo_name}/restore")
+async def restore_snapshot(repo_name: str, snapshot_id: Optional[str] = None, target_name: Optional[str] = None):
+    """Restore a repository from its snapshots, optionally under a new name."""
+    target_name = target_name or repo_name
+    
+    if repo_exists(target_name):
+        raise HTTPException(status_code=400, detail=f"Repository '{target_name}' already exists")
+    
+    try:
+        snapshot = await asyncio.to_thread(
+            backup.restore_repository, repo_name, get_repo_path(target_name), snapshot_id
+        )
+        return {"message": f"Repository '{target_name}' restored from snapshot '{snapshot['id']}'"}
+    except backup.SnapshotNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error restoring repository: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to restore repository: {str(e)}")
+
 @app.get("/repos/{repo_name}/branches")
 async def list_branches(repo_name: str):
     """List all branches in a repository."""
@@ -272,6 +344,21 @@ async def get_file_content(repo_name: str, file_path: str, branch: Optional[str]
         if not os.path.isfile(full_path):
             raise HTTPException(status_code=404, detail=f"File '{file_path}' not found")
         
+        # Large files are committed as pointers; stream them from the object store
+        pointer = lfs.read_pointer(full_path)
+        if pointer:
+            oid, size = pointer
+            stored_size = lfs.object_size(oid)
+            if stored_size is None:
+                raise HTTPException(status_code=404, detail=f"Large object for '{file_path}' not found")
+            if stored_size != size:
+                raise HTTPException(status_code=409, detail=f"Large object for '{file_path}' does not match its pointer")
+            return StreamingResponse(
+                lfs.iter_object(oid),
+                media_type="application/octet-stream",
+                headers={"Content-Length": str(size), "X-LFS-OID": oid}
+            )
+        
         # Read the file content
         with open(full_path, "r") as f:
             content = f.read()
@@ -283,45 +370,121 @@ async def get_file_content(repo_name: str, file_path: str, branch: Optional[str]
         logger.error(f"Error getting file content: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get file content: {str(e)}")
 
+async def store_large_file(stream) -> Tuple[bytes, Dict[str, Any]]:
+    """Store a large file in the object store off the event loop and return its pointer and object details."""
+    oid, size, new_chunks = await asyncio.to_thread(lfs.store_stream, stream)
+    return lfs.make_pointer(oid, size).encode("utf-8"), {"oid": oid, "size": size, "new_chunks": new_chunks}
+
+def commit_file(repo: git.Repo, branch: str, file_path: str, data: bytes, commit_message: str,
+                author_name: str, author_email: str):
+    """Write a file to a repository branch and commit it."""
+    if branch not in [b.name for b in repo.branches]:
+        raise HTTPException(status_code=404, detail=f"Branch '{branch}' not found")
+    
+    # Checkout the branch
+    repo.git.checkout(branch)
+    
+    # Get the full path to the file
+    full_path = os.path.join(repo.working_dir, file_path)
+    
+    # Create directory if it doesn't exist
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    
+    # Write the file content
+    with open(full_path, "wb") as f:
+        f.write(data)
+    
+    # Add the file to the staging area
+    repo.git.add(file_path)
+    
+    # Configure the author
+    repo.git.config("user.name", author_name)
+    repo.git.config("user.email", author_email)
+    
+    # Commit the changes
+    repo.git.commit("-m", commit_message)
+
 @app.put("/repos/{repo_name}/files/{file_path:path}")
 async def update_file(repo_name: str, file_path: str, file_data: FileContent, branch: Optional[str] = "main"):
     """Update a file in a repository branch and commit the changes."""
     repo = get_repo(repo_name)
     
     try:
-        if branch not in [b.name for b in repo.branches]:
-            raise HTTPException(status_code=404, detail=f"Branch '{branch}' not found")
-        
-        # Checkout the branch
-        repo.git.checkout(branch)
-        
-        # Get the full path to the file
-        full_path = os.path.join(repo.working_dir, file_path)
-        
-        # Create directory if it doesn't exist
-        os.makedirs(os.path.dirname(full_path), exist_ok=True)
-        
-        # Write the file content
-        with open(full_path, "w") as f:
-            f.write(file_data.content)
-        
-        # Add the file to the staging area
-        repo.git.add(file_path)
-        
-        # Configure the author
-        repo.git.config("user.name", file_data.author_name)
-        repo.git.config("user.email", file_data.author_email)
+        large_object = None
+        
+        # Decode the file content; large base64 content is decoded piece by piece straight into the object store
+        if file_data.encoding == "base64":
+            try:
+                reader = lfs.Base64Reader(file_data.content)
+                if lfs.should_store(reader.size):
+                    data, large_object = await store_large_file(reader)
+                else:
+                    data = base64.b64decode(file_data.content, validate=True)
+            except binascii.Error:
+                raise HTTPException(status_code=400, detail="Content is not valid base64")
+        elif file_data.encoding == "utf-8":
+            data = file_data.content.encode("utf-8")
+            # Store large files in the large-object tier and commit a pointer instead
+            if lfs.should_store(len(data)):
+                data, large_object = await store_large_file(io.BytesIO(data))
+        else:
+            raise HTTPException(status_code=400, detail=f"Unsupported encoding '{file_data.encoding}'")
         
-        # Commit the changes
-        repo.git.commit("-m", file_data.commit_message)
+        commit_file(repo, branch, file_path, data, file_data.commit_message,
+                    file_data.author_name, file_data.author_email)
         
-        return {"message": f"File '{file_path}' updated and committed successfully"}
+        response = {"message": f"File '{file_path}' updated and committed successfully"}
+        if large_object:
+            response["large_object"] = large_object
+        return response
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error updating file: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to update file: {str(e)}")
 
+@app.put("/repos/{repo_name}/uploads/{file_path:path}")
+async def upload_file(
+    repo_name: str,
+    file_path: str,
+    request: Request,
+    commit_message: str,
+    author_name: str,
+    author_email: str,
+    branch: Optional[str] = "main"
+):
+    """Upload a file as the raw request body and commit it, streaming large files into the object store."""
+    repo = get_repo(repo_name)
+    
+    try:
+        large_object = None
+        
+        # Spool the body to disk so no upload is held in memory
+        with tempfile.TemporaryFile() as spool:
+            size = 0
+            async for chunk in request.stream():
+                await asyncio.to_thread(spool.write, chunk)
+                size += len(chunk)
+            spool.seek(0)
+            
+            # Store large files in the large-object tier and commit a pointer instead
+            if lfs.should_store(size):
+                data, large_object = await store_large_file(spool)
+            else:
+                data = spool.read()
+        
+        commit_file(repo, branch, file_path, data, commit_message, author_name, author_email)
+        
+        response = {"message": f"File '{file_path}' uploaded and committed successfully"}
+        if large_object:
+            response["large_object"] = large_object
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error uploading file: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to upload file: {str(e)}")
+
 @app.delete("/repos/{repo_name}/files/{file_path:path}")
 async def delete_file(
     repo_name: str, 
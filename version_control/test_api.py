@@ -1,5 +1,6 @@
 import requests
 import json
+import base64
 import time
 import os
 import random
@@ -8,6 +9,9 @@ import string
 # Base URL for the API
 BASE_URL = "http://localhost:8000"
 
+# Size of the large files committed by the test, above the default LFS_THRESHOLD_BYTES of 1 MiB
+LARGE_FILE_SIZE = 3 * 1024 * 1024
+
 def print_response(response):
     """Print the response in a formatted way."""
     print(f"Status Code: {response.status_code}")
@@ -410,9 +414,140 @@ def get_transaction(transaction_id):
         print("Diff between first and last commit:")
         print_response(response)
 
+    # Large files are committed as pointers and stored once in the object store
+    test_large_files(repo_name)
+
+    # Snapshots restore the repository after it is deleted
+    test_backups(repo_name)
+
     print("\n✅ VERSION CONTROL API TEST COMPLETED SUCCESSFULLY!")
     print(f"\n📊 SUMMARY:\n- Repository: {repo_name}\n- Branches created: {', '.join(branches + ['main'])}\n- Features implemented: User Authentication, Payment Gateway\n- Development workflow demonstrated: Feature branches → Development → Main")
 
+def test_large_files(repo_name):
+    """Commit a file above the large-file threshold through both upload endpoints and read it back."""
+    content = os.urandom(LARGE_FILE_SIZE)
+    author = {"author_name": "Data Scientist", "author_email": "data@college.edu"}
+
+    print("\n📦 COMMITTING A LARGE FILE THROUGH PUT /files...")
+    response = requests.put(
+        f"{BASE_URL}/repos/{repo_name}/files/assets/dataset.bin",
+        params={"branch": "main"},
+        json={
+            "content": base64.b64encode(content).decode("ascii"),
+            "encoding": "base64",
+            "commit_message": "Add training dataset",
+            **author
+        }
+    )
+    print_response(response)
+    assert response.status_code == 200
+    stored = response.json()["large_object"]
+    assert stored["size"] == len(content) and stored["new_chunks"] > 0
+
+    # Git holds only the pointer, not the content
+    print("\n🔍 CHECKING THAT GIT STORES A POINTER...")
+    commits = requests.get(f"{BASE_URL}/repos/{repo_name}/commits", params={"branch": "main"}).json()["commits"]
+    diff = requests.get(f"{BASE_URL}/repos/{repo_name}/diff", params={"commit1": commits[0]["id"]}).json()["diff"]
+    print(diff)
+    assert "version https://git-lfs.github.com/spec/v1" in diff
+    assert f"oid sha256:{stored['oid']}" in diff and f"size {len(content)}" in diff
+
+    print("\n📥 DOWNLOADING THE LARGE FILE...")
+    response = requests.get(f"{BASE_URL}/repos/{repo_name}/files/assets/dataset.bin", params={"branch": "main"})
+    print(f"Status Code: {response.status_code}, {len(response.content)} bytes, X-LFS-OID: {response.headers.get('X-LFS-OID')}")
+    assert response.status_code == 200 and response.content == content
+    assert response.headers["X-LFS-OID"] == stored["oid"]
+
+    # The same content uploaded again reuses the stored chunks
+    print("\n📦 UPLOADING THE SAME CONTENT THROUGH PUT /uploads...")
+    response = requests.put(
+        f"{BASE_URL}/repos/{repo_name}/uploads/assets/dataset-copy.bin",
+        params={"branch": "main", "commit_message": "Add a copy of the training dataset", **author},
+        data=content
+    )
+    print_response(response)
+    assert response.status_code == 200
+    copy = response.json()["large_object"]
+    assert copy["oid"] == stored["oid"] and copy["size"] == len(content) and copy["new_chunks"] == 0
+
+    response = requests.get(f"{BASE_URL}/repos/{repo_name}/files/assets/dataset-copy.bin", params={"branch": "main"})
+    assert response.status_code == 200 and response.content == content
+
+def repository_state(repo_name):
+    """Get the tip of every branch and the commits reachable from HEAD."""
+    branches = requests.get(f"{BASE_URL}/repos/{repo_name}/branches").json()["branches"]
+    tips = {
+        branch: requests.get(f"{BASE_URL}/repos/{repo_name}/commits", params={"branch": branch}).json()["commits"][0]["id"]
+        for branch in branches
+    }
+    head = [commit["id"] for commit in requests.get(f"{BASE_URL}/repos/{repo_name}/commits").json()["commits"]]
+    return tips, head
+
+def commit_note(repo_name, name):
+    """Commit a small file to the main branch."""
+    response = requests.put(
+        f"{BASE_URL}/repos/{repo_name}/files/notes/{name}.md",
+        params={"branch": "main"},
+        json={
+            "content": f"# {name}\n",
+            "commit_message": f"Add {name} notes",
+            "author_name": "Student Developer",
+            "author_email": "student@college.edu"
+        }
+    )
+    assert response.status_code == 200
+
+def take_snapshot(repo_name):
+    """Take a snapshot of the repository and return it."""
+    response = requests.post(f"{BASE_URL}/repos/{repo_name}/snapshots")
+    print_response(response)
+    assert response.status_code == 200
+    return response.json()["snapshot"]
+
+def delete_and_restore(repo_name):
+    """Delete the repository, restore it from its snapshots and check nothing changed."""
+    state = repository_state(repo_name)
+
+    print(f"\n🗑️ DELETING REPOSITORY '{repo_name}'...")
+    response = requests.delete(f"{BASE_URL}/repos/{repo_name}")
+    print_response(response)
+    assert response.status_code == 200
+
+    print(f"\n♻️ RESTORING REPOSITORY '{repo_name}'...")
+    response = requests.post(f"{BASE_URL}/repos/{repo_name}/restore")
+    print_response(response)
+    assert response.status_code == 200
+    assert repository_state(repo_name) == state
+
+def test_backups(repo_name):
+    """Snapshot a repository, restore it after deletion, and again once a new full chain has started."""
+    print("\n💾 TAKING A FULL SNAPSHOT...")
+    assert take_snapshot(repo_name)["full"]
+
+    commit_note(repo_name, "week-1")
+    print("\n💾 TAKING AN INCREMENTAL SNAPSHOT...")
+    assert not take_snapshot(repo_name)["full"]
+
+    delete_and_restore(repo_name)
+
+    # Keep committing until the periodic full snapshot (every BACKUP_FULL_EVERY snapshots) starts a new chain
+    print("\n💾 TAKING SNAPSHOTS UNTIL A NEW FULL CHAIN STARTS...")
+    for week in range(2, 102):
+        commit_note(repo_name, f"week-{week}")
+        if take_snapshot(repo_name)["full"]:
+            break
+    else:
+        raise AssertionError("No new full snapshot was taken")
+
+    commit_note(repo_name, "final")
+    assert not take_snapshot(repo_name)["full"]
+
+    delete_and_restore(repo_name)
+
+    # Large file content lives outside the bundles and is still served after the restore
+    response = requests.get(f"{BASE_URL}/repos/{repo_name}/files/assets/dataset.bin", params={"branch": "main"})
+    assert response.status_code == 200 and len(response.content) == LARGE_FILE_SIZE
+
 if __name__ == "__main__":
     # Wait for the API to be ready
     print("Waiting for the API to be ready...")